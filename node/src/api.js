@@ -9,15 +9,67 @@
 // ==============================================================
 
 const axios = require('axios');
+const https = require('https');
 const cfg   = require('./config');
 const log   = require('./logger');
 
+// ── Shared HTTP client ────────────────────────────────────────
+// One keep-alive agent for every Capital.com call so the tick loop and
+// the candle pollers reuse warm TLS sockets instead of paying a fresh
+// handshake per request.  maxSockets covers all loops firing at once.
+// LIFO scheduling hands out the most recently used socket first, so
+// traffic concentrates on a few hot connections and the rest age out.
+const _agent = new https.Agent({
+  keepAlive:      true,
+  maxSockets:     16,
+  maxFreeSockets: 8,
+  scheduling:     'lifo',
+});
+
+// The API key is constant for the process, so it rides on every request
+// as a default header; session tokens are added per call (_authHeaders).
+const http = axios.create({
+  httpsAgent: _agent,
+  timeout:    15_000,
+  headers:    { 'X-CAP-API-KEY': cfg.apiKey },
+});
+
+// Retry transient gateway errors (502/503/504) on GET requests only.
+// Order placement and closes are never retried here — a duplicate POST
+// or DELETE could open or close a second position.
+const RETRY_MAX      = 2;
+const RETRY_BASE_MS  = 200;
+const RETRY_STATUSES = new Set([502, 503, 504]);
+
+http.interceptors.response.use(null, async (err) => {
+  const req = err.config;
+  if (!req || req.method !== 'get' || !RETRY_STATUSES.has(err.response?.status)) {
+    throw err;
+  }
+  req._retryCount = (req._retryCount || 0) + 1;
+  if (req._retryCount > RETRY_MAX) throw err;
+  await sleep(RETRY_BASE_MS * 2 ** (req._retryCount - 1));
+  return http.request(req);
+});
+
+// ── Endpoints ──────────────────────────────────────────────────
+// Built once: the base URL is fixed for the life of the process.
+const API_ROOT      = `${cfg.baseUrl}/api/v1`;
+const URL_SESSION   = `${API_ROOT}/session`;
+const URL_ACCOUNTS  = `${API_ROOT}/accounts`;
+const URL_POSITIONS = `${API_ROOT}/positions`;
+const URL_ACTIVITY  = `${API_ROOT}/history/activity`;
+
 // ── Live session tokens ────────────────────────────────────────
 let _cst          = null;
 let _secToken     = null;
 let _accountId    = null;   // currentAccountId returned by POST /session
 let _refreshTimer = null;
 
+// Auth headers are rebuilt only when the tokens change (login, account
+// switch, logout) and shared by reference across every request.
+let _authHeaders  = {};
+
 // ── Per-epic decimal precision cache ──────────────────────────
 // Populated lazily by getMarketInfo(); used by roundForEpic().
 const _epicDecimals = {};
@@ -26,7 +78,7 @@ const _epicDecimals = {};
 
 function sleep(ms) { return new Promise(r => setTimeout(r, ms)); }
 
-function authHeaders() {
+function _rebuildAuthHeaders() {
   const h = {
     'X-SECURITY-TOKEN': _secToken,
     'CST':              _cst,
@@ -36,7 +88,7 @@ function authHeaders() {
   // without it the server cannot resolve which account to operate on
   // and returns {"errorCode":"error.null.accountId"}.
   if (_accountId) h['X-CAP-ACCOUNT-ID'] = _accountId;
-  return h;
+  _authHeaders = h;
 }
 
 function mid({ bid, ask }) {
@@ -47,32 +99,60 @@ function round(v, decimals = 2) {
   return Math.round(v * 10 ** decimals) / 10 ** decimals;
 }
 
+// Capital.com timestamps are UTC, e.g. '2024-03-01T14:05:00' or
+// '2024/03/01 14:05:00'.  Parsed by field with Date.UTC — no string
+// rewriting or Date object per bar.
+const CAP_TIME_RE = /^(\d{4})[-/](\d{2})[-/](\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,3}))?/;
+
 function parseCapTime(str) {
   if (!str) return 0;
-  const s = str.replace(/\//g, '-').replace(' ', 'T');
-  return new Date(s.includes('Z') ? s : s + 'Z').getTime();
+  const m = CAP_TIME_RE.exec(str);
+  if (!m) {
+    const s = str.replace(/\//g, '-').replace(' ', 'T');
+    return new Date(s.includes('Z') ? s : s + 'Z').getTime();
+  }
+  return Date.UTC(+m[1], +m[2] - 1, +m[3], +m[4], +m[5], +m[6], m[7] ? +m[7].padEnd(3, '0') : 0);
 }
 
 // ── Deal confirmation (two-step flow) ─────────────────────────
 
+const CONFIRM_BACKOFF      = 1.6;
+const CONFIRM_MAX_DELAY_MS = 1_000;
+
 /**
  * Poll GET /confirms/{dealReference} until dealStatus resolves.
  * Capital.com's POST/DELETE /positions returns only a dealReference;
  * the actual outcome must be confirmed via this endpoint.
  *
+ * The first poll fires immediately (most deals confirm on it); later
+ * polls back off exponentially from delayMs up to CONFIRM_MAX_DELAY_MS,
+ * covering roughly 3.5 s in total before giving up.
+ *
  * @param {string} dealReference
  * @param {number} retries   Maximum polling attempts
- * @param {number} delayMs   Delay between attempts in ms
+ * @param {number} delayMs   Delay before the second attempt in ms
  * @returns {Promise<object>} Confirmed deal data
  */
-async function _confirmDeal(dealReference, retries = 6, delayMs = 500) {
+async function _confirmDeal(dealReference, retries = 8, delayMs = 100) {
   for (let attempt = 0; attempt < retries; attempt++) {
-    await sleep(delayMs);
+    if (attempt > 0) {
+      await sleep(delayMs);
+      delayMs = Math.min(delayMs * CONFIRM_BACKOFF, CONFIRM_MAX_DELAY_MS);
+    }
 
-    const res = await axios.get(
-      `${cfg.baseUrl}/api/v1/confirms/${dealReference}`,
-      { headers: authHeaders() }
-    );
+    let res;
+    try {
+      res = await http.get(
+        `${API_ROOT}/confirms/${dealReference}`,
+        { headers: _authHeaders }
+      );
+    } catch (e) {
+      // Polling with no initial delay can race the deal being registered;
+      // a 404 here means "not yet known", not a rejection.
+      if (e.response?.status !== 404) throw e;
+      if (log.isDebug()) log.debug(`[API] Confirm attempt ${attempt + 1}/${retries} — ${dealReference} not registered yet`);
+      continue;
+    }
 
     const data       = res.data;
     const dealStatus = data.dealStatus;
@@ -85,7 +165,7 @@ async function _confirmDeal(dealReference, retries = 6, delayMs = 500) {
     }
 
     // dealStatus absent — API still processing, retry
-    log.debug(`[API] Confirm attempt ${attempt + 1}/${retries} — awaiting dealStatus for ${dealReference}`);
+    if (log.isDebug()) log.debug(`[API] Confirm attempt ${attempt + 1}/${retries} — awaiting dealStatus for ${dealReference}`);
   }
 
   throw new Error(`Deal confirmation timed out after ${retries} attempts: ${dealReference}`);
@@ -102,10 +182,10 @@ async function _confirmDeal(dealReference, retries = 6, delayMs = 500) {
 async function createSession() {
   let res;
   try {
-    res = await axios.post(
-      `${cfg.baseUrl}/api/v1/session`,
+    res = await http.post(
+      URL_SESSION,
       { identifier: cfg.email, password: cfg.password, encryptedPassword: false },
-      { headers: { 'X-CAP-API-KEY': cfg.apiKey, 'Content-Type': 'application/json' } }
+      { headers: { 'Content-Type': 'application/json' } }
     );
   } catch (err) {
     const body = err.response?.data;
@@ -121,6 +201,7 @@ async function createSession() {
   _cst       = res.headers['cst'];
   _secToken  = res.headers['x-security-token'];
   _accountId = res.data.currentAccountId ?? null;
+  _rebuildAuthHeaders();
 
   // Log all available accounts so the user can identify their demo account ID
   const accounts = res.data.accounts || [];
@@ -137,15 +218,16 @@ async function createSession() {
   if (cfg.accountId && cfg.accountId !== _accountId) {
     try {
       log.info(`[API] Switching account: ${_accountId} → ${cfg.accountId}...`);
-      const switchRes = await axios.put(
-        `${cfg.baseUrl}/api/v1/session`,
+      const switchRes = await http.put(
+        URL_SESSION,
         { accountId: cfg.accountId },
-        { headers: authHeaders() }
+        { headers: _authHeaders }
       );
       // Capital.com issues new tokens after an account switch
       if (switchRes.headers['cst'])              _cst       = switchRes.headers['cst'];
       if (switchRes.headers['x-security-token']) _secToken  = switchRes.headers['x-security-token'];
       _accountId = cfg.accountId;
+      _rebuildAuthHeaders();
       log.info(`[API] Account switched to: ${_accountId}`);
     } catch (e) {
       log.warn(`[API] Account switch failed (will use default): ${e.message}`);
@@ -175,9 +257,10 @@ async function destroySession() {
   clearInterval(_refreshTimer);
   if (!_cst) return;
   try {
-    await axios.delete(`${cfg.baseUrl}/api/v1/session`, { headers: authHeaders() });
+    await http.delete(URL_SESSION, { headers: _authHeaders });
   } catch { /* non-fatal */ }
   _cst = _secToken = _accountId = null;
+  _authHeaders = {};
   log.info('[API] Session destroyed.');
 }
 
@@ -187,25 +270,60 @@ async function destroySession() {
 
 /**
  * Fetch OHLC candles.
+ *
+ * Bars are returned column-wise (one Float64Array per field) rather than as
+ * an array of per-bar objects, so downstream indicator code can read the
+ * close/high/low series directly without re-mapping on every call.
+ *
  * @param {string} epic        e.g. 'XAUUSD'
  * @param {string} resolution  'MINUTE_5' | 'MINUTE_15' | 'HOUR' | 'HOUR_4'
  * @param {number} max         Number of bars (including current in-progress bar)
- * @returns {{ time:number, open:number, high:number, low:number, close:number, vol:number }[]}
+ * @returns {{ time:Float64Array, open:Float64Array, high:Float64Array, low:Float64Array, close:Float64Array, vol:Float64Array }}
  */
 async function getCandles(epic, resolution, max = 200) {
-  const res = await axios.get(
-    `${cfg.baseUrl}/api/v1/prices/${epic}`,
-    { params: { resolution, max }, headers: authHeaders() }
+  const res = await http.get(
+    `${API_ROOT}/prices/${epic}`,
+    { params: { resolution, max }, headers: _authHeaders }
   );
 
-  return (res.data.prices || []).map(p => ({
-    time:  parseCapTime(p.snapshotTimeUTC || p.snapshotTime),
-    open:  mid(p.openPrice),
-    high:  mid(p.highPrice),
-    low:   mid(p.lowPrice),
-    close: mid(p.closePrice),
-    vol:   p.lastTradedVolume || 0,
-  })).sort((a, b) => a.time - b.time);
+  const prices = res.data.prices || [];
+  const n      = prices.length;
+  const cols   = _candleColumns(n);
+  let   sorted = true;
+
+  for (let i = 0; i < n; i++) {
+    const p = prices[i];
+    cols.time[i]  = parseCapTime(p.snapshotTimeUTC || p.snapshotTime);
+    cols.open[i]  = mid(p.openPrice);
+    cols.high[i]  = mid(p.highPrice);
+    cols.low[i]   = mid(p.lowPrice);
+    cols.close[i] = mid(p.closePrice);
+    cols.vol[i]   = p.lastTradedVolume || 0;
+    if (i && cols.time[i] < cols.time[i - 1]) sorted = false;
+  }
+
+  // Capital.com returns bars oldest-first; only reorder if it ever doesn't
+  return sorted ? cols : _sortColumns(cols);
+}
+
+const CANDLE_FIELDS = ['time', 'open', 'high', 'low', 'close', 'vol'];
+
+function _candleColumns(n) {
+  const cols = {};
+  for (const f of CANDLE_FIELDS) cols[f] = new Float64Array(n);
+  return cols;
+}
+
+/** Reorder every column by ascending time. */
+function _sortColumns(cols) {
+  const n     = cols.time.length;
+  const order = Array.from({ length: n }, (_, i) => i).sort((a, b) => cols.time[a] - cols.time[b]);
+  const out   = _candleColumns(n);
+  for (const f of CANDLE_FIELDS) {
+    const src = cols[f], dst = out[f];
+    for (let i = 0; i < n; i++) dst[i] = src[order[i]];
+  }
+  return out;
 }
 
 /**
@@ -215,9 +333,9 @@ async function getCandles(epic, resolution, max = 200) {
  *   status: 'TRADEABLE' | 'CLOSED' | 'EDITS_ONLY' | 'OFFLINE' | 'SUSPENDED' | ...
  */
 async function getPrice(epic) {
-  const res = await axios.get(
-    `${cfg.baseUrl}/api/v1/markets/${epic}`,
-    { headers: authHeaders() }
+  const res = await http.get(
+    `${API_ROOT}/markets/${epic}`,
+    { headers: _authHeaders }
   );
   const s = res.data.snapshot;
 
@@ -287,9 +405,9 @@ async function recoverPnlFromHistory(dealId, openedTimeMs) {
  * @returns {{ accountId:string, balance: { available:number } } | null}
  */
 async function getAccount() {
-  const res = await axios.get(
-    `${cfg.baseUrl}/api/v1/accounts`,
-    { headers: authHeaders() }
+  const res = await http.get(
+    URL_ACCOUNTS,
+    { headers: _authHeaders }
   );
   const accounts = res.data.accounts || [];
   // Return the account matching the active session accountId (Bug #2 fix)
@@ -304,9 +422,9 @@ async function getAccount() {
  * Fetch all open positions from the platform.
  */
 async function getPositions() {
-  const res = await axios.get(
-    `${cfg.baseUrl}/api/v1/positions`,
-    { headers: authHeaders() }
+  const res = await http.get(
+    URL_POSITIONS,
+    { headers: _authHeaders }
   );
   return res.data.positions || [];
 }
@@ -338,10 +456,10 @@ async function createPosition({ epic, direction, size, stopLevel, profitLevel })
 
   log.trade(`[API] createPosition → ${direction} ${size} ${epic} | SL=${body.stopLevel} TP=${body.profitLevel}`);
 
-  const res = await axios.post(
-    `${cfg.baseUrl}/api/v1/positions`,
+  const res = await http.post(
+    URL_POSITIONS,
     body,
-    { headers: authHeaders() }
+    { headers: _authHeaders }
   );
 
   const dealReference = res.data.dealReference;
@@ -382,9 +500,9 @@ async function createPosition({ epic, direction, size, stopLevel, profitLevel })
 async function closePosition(dealId) {
   log.trade(`[API] closePosition → dealId=${dealId}`);
 
-  const res = await axios.delete(
-    `${cfg.baseUrl}/api/v1/positions/${dealId}`,
-    { headers: authHeaders() }
+  const res = await http.delete(
+    `${URL_POSITIONS}/${dealId}`,
+    { headers: _authHeaders }
   );
 
   const dealReference = res.data.dealReference;
@@ -408,10 +526,10 @@ async function updatePosition(dealId, { stopLevel, profitLevel, epic = cfg.EPIC
   if (stopLevel   !== undefined) body.stopLevel   = roundForEpic(stopLevel,   epic);
   if (profitLevel !== undefined) body.profitLevel = roundForEpic(profitLevel, epic);
 
-  const res = await axios.put(
-    `${cfg.baseUrl}/api/v1/positions/${dealId}`,
+  const res = await http.put(
+    `${URL_POSITIONS}/${dealId}`,
     body,
-    { headers: authHeaders() }
+    { headers: _authHeaders }
   );
   return res.data;
 }
@@ -423,9 +541,9 @@ async function updatePosition(dealId, { stopLevel, profitLevel, epic = cfg.EPIC
  */
 async function getPosition(dealId) {
   try {
-    const res = await axios.get(
-      `${cfg.baseUrl}/api/v1/positions/${dealId}`,
-      { headers: authHeaders() }
+    const res = await http.get(
+      `${URL_POSITIONS}/${dealId}`,
+      { headers: _authHeaders }
     );
     return res.data ?? null;
   } catch (e) {
@@ -444,9 +562,9 @@ async function getPosition(dealId) {
  */
 async function getDayActivity(fromMs) {
   const from = new Date(fromMs).toISOString().replace(/\.\d{3}Z$/, '');
-  const res = await axios.get(
-    `${cfg.baseUrl}/api/v1/history/activity`,
-    { params: { from, detailed: true }, headers: authHeaders() }
+  const res = await http.get(
+    URL_ACTIVITY,
+    { params: { from, detailed: true }, headers: _authHeaders }
   );
   return res.data.activities || [];
 }
@@ -7,6 +7,7 @@
 const api         = require('./api');
 const cfg         = require('./config');
 const log         = require('./logger');
+const ind         = require('./indicators');
 const candlesRepo = require('./repo/candlesRepo');
 
 // Resolution names used by Capital.com API
@@ -45,17 +46,105 @@ const TF_MS = {
  * elapsed since its timestamp, i.e. elapsed >= TF_MS[tf].
  *
  * @param {'M1'|'M5'|'M15'|'H1'|'H4'} tf
- * @param {object[]} bars
- * @returns {object[]}
+ * @param {Candles} bars
+ * @returns {Candles}
  */
 function dropInProgress(tf, bars) {
-  if (!bars.length) return bars;
-  const last      = bars[bars.length - 1];
-  const elapsed   = Date.now() - last.time;
+  const n = size(bars);
+  if (!n) return bars;
+  const elapsed    = Date.now() - bars.time[n - 1];
   const inProgress = elapsed < TF_MS[tf];
-  return inProgress ? bars.slice(0, -1) : bars;
+  return inProgress ? sliceCols(bars, 0, n - 1) : bars;
 }
 
+// ── Column helpers ──────────────────────────────────────────────
+// Candles are held column-wise: { time, open, high, low, close, vol },
+// each a Float64Array of the same length (see api.getCandles).
+
+/**
+ * @typedef {{ time:Float64Array, open:Float64Array, high:Float64Array,
+ *             low:Float64Array, close:Float64Array, vol:Float64Array }} Candles
+ */
+
+const FIELDS = ['time', 'open', 'high', 'low', 'close', 'vol'];
+
+function allocCols(n) {
+  const c = {};
+  for (const f of FIELDS) c[f] = new Float64Array(n);
+  return c;
+}
+
+/** Number of bars in a column set. */
+function size(c) {
+  return c.time.length;
+}
+
+/** Zero-copy view of bars [start, end). */
+function sliceCols(c, start, end = size(c)) {
+  const out = {};
+  for (const f of FIELDS) out[f] = c[f].subarray(start, end);
+  return out;
+}
+
+/** Number of bars with time > `time` (binary search — times ascend). */
+function countAfter(c, time) {
+  let lo = 0, hi = size(c);
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (c.time[mid] <= time) lo = mid + 1; else hi = mid;
+  }
+  return size(c) - lo;
+}
+
+/**
+ * @typedef {{ time:number, open:number, high:number, low:number,
+ *             close:number, vol:number }} Bar
+ */
+
+/**
+ * Materialise a single bar as a plain object (for log lines and callers
+ * that want `bar.close` etc.).  Returns undefined when out of range.
+ * @returns {Bar|undefined}
+ */
+function barAt(c, i) {
+  if (i < 0) i += size(c);
+  if (i < 0 || i >= size(c)) return undefined;
+  return {
+    time:  c.time[i],
+    open:  c.open[i],
+    high:  c.high[i],
+    low:   c.low[i],
+    close: c.close[i],
+    vol:   c.vol[i],
+  };
+}
+
+// Latest bar per column set, keyed by its `time` array.  A view's bars are
+// never rewritten (appends produce a new view), so the cached object stays
+// valid for as long as the view is reachable.
+const _lastBars = new WeakMap();
+
+/**
+ * The latest bar of a column set, built once per view and shared by every
+ * caller — treat it as read-only.
+ * @returns {Bar|undefined}
+ */
+function lastBar(c) {
+  let bar = _lastBars.get(c.time);
+  if (bar === undefined) {
+    bar = barAt(c, -1);
+    if (bar) _lastBars.set(c.time, Object.freeze(bar));
+  }
+  return bar;
+}
+
+// Coarse timeframes rebuilt locally from a finer one after startup, so
+// they need no poll loop of their own: fine → coarse.
+const ROLLUP = {
+  M5: 'M15',
+  H1: 'H4',
+};
+
 // Per-TF history depth.
 // M1: 300 bars (covers EMA50 warmup for micro-confirm).
 // M5/M15: 600 bars — 200 for EMA200 warmup + 400 bars of live context.
@@ -68,8 +157,50 @@ const TF_HISTORY = {
   H4:  cfg.HISTORY_BARS,
 };
 
-// In-memory candle stores (closed bars only)
-const store = { M1: [], M5: [], M15: [], H1: [], H4: [] };
+// Bounded per-TF buffers with 2× TF_HISTORY capacity.  New bars are written
+// past the live window [start, end); once the buffer is full, the live window
+// is copied into a fresh buffer — one copy per ~TF_HISTORY appends, so
+// appends are amortised O(1).  Bars already handed out by get() are never
+// overwritten, since writes only ever land beyond `end` or in a new buffer.
+const buffers = {};
+for (const tf of Object.keys(TF_HISTORY)) {
+  buffers[tf] = { cols: allocCols(2 * TF_HISTORY[tf]), start: 0, end: 0 };
+}
+
+// In-memory candle stores (closed bars only) — views over buffers[tf]
+const store = {};
+for (const tf of Object.keys(TF_HISTORY)) store[tf] = sliceCols(buffers[tf].cols, 0, 0);
+
+/** Replace the TF's history with `bars`. */
+function resetBuffer(tf, bars) {
+  const n    = size(bars);
+  const cols = allocCols(2 * Math.max(TF_HISTORY[tf], n));
+  for (const f of FIELDS) cols[f].set(bars[f], 0);
+  buffers[tf] = { cols, start: 0, end: n };
+  store[tf]   = sliceCols(cols, 0, n);
+  resetIndicatorState(tf);
+  _advanceStreams(tf);
+}
+
+/** Append `bars` to the TF's history, keeping the last TF_HISTORY[tf]. */
+function appendBars(tf, bars) {
+  const k   = size(bars);
+  let   buf = buffers[tf];
+
+  if (buf.end + k > size(buf.cols)) {
+    const live = buf.end - buf.start;
+    const cols = allocCols(2 * Math.max(TF_HISTORY[tf], live + k));
+    for (const f of FIELDS) cols[f].set(buf.cols[f].subarray(buf.start, buf.end), 0);
+    buf = buffers[tf] = { cols, start: 0, end: live };
+  }
+
+  for (const f of FIELDS) buf.cols[f].set(bars[f], buf.end);
+  buf.end += k;
+  if (buf.end - buf.start > TF_HISTORY[tf]) buf.start = buf.end - TF_HISTORY[tf];
+  store[tf] = sliceCols(buf.cols, buf.start, buf.end);
+  _memo[tf]?.clear();
+  _advanceStreams(tf);
+}
 
 // Timestamp of the most recently processed closed bar per TF
 const lastClosedTime = { M1: 0, M5: 0, M15: 0, H1: 0, H4: 0 };
@@ -88,28 +219,29 @@ function activeTFs() {
 /**
  * Fetch full history for all active timeframes at startup.
  * Uses TF_HISTORY[tf] bars to cover the 200-period EMA warmup.
+ * The requests go out together (at most five, well inside Capital.com's
+ * per-second limit) over the shared keep-alive agent.
  */
 async function loadHistory() {
-  for (const tf of activeTFs()) {
+  await Promise.all(activeTFs().map(tf => {
     log.info(`[Candles] Loading ${TF_HISTORY[tf]} bars for ${tf}...`);
-    await fetchFull(tf, TF_HISTORY[tf]);
-    await sleep(250);   // light API throttle
-  }
+    return fetchFull(tf, TF_HISTORY[tf]);
+  }));
 }
 
 async function fetchFull(tf, max) {
   // Fetch max+1 to have enough bars even after dropping the in-progress one
   const bars   = await api.getCandles(cfg.EPIC, RESOLUTION[tf], max + 1);
   const closed = dropInProgress(tf, bars);
-  store[tf]    = closed;
+  resetBuffer(tf, closed);
 
-  if (closed.length) {
-    lastClosedTime[tf] = closed[closed.length - 1].time;
+  if (size(closed)) {
+    lastClosedTime[tf] = closed.time[size(closed) - 1];
   }
-  const latestBar = closed[closed.length - 1];
+  const latestBar = barAt(closed, -1);
   const latestISO = new Date(lastClosedTime[tf]).toISOString();
   log.info(
-    `[Candles] ${tf}: ${closed.length} closed bars loaded` +
+    `[Candles] ${tf}: ${size(closed)} closed bars loaded` +
     (latestBar ? ` — last close=${latestBar.close.toFixed(4)} at ${latestISO}` : ` (none)`)
   );
 }
@@ -126,54 +258,289 @@ async function fetchFull(tf, max) {
 async function update(tf) {
   const bars   = await api.getCandles(cfg.EPIC, RESOLUTION[tf], cfg.INCREMENTAL_BARS + 1);
   const closed = dropInProgress(tf, bars);
-  if (!closed.length) return false;
+  const n = size(closed);
+  if (!n) return false;
 
-  const newest      = closed[closed.length - 1];
+  const newest      = barAt(closed, n - 1);
   const hadNewClose = newest.time > lastClosedTime[tf];
 
   if (hadNewClose) {
     // Append bars with timestamps newer than the last known closed bar.
     // No Set needed: bars arrive in chronological order and lastClosedTime
-    // is the boundary — anything after it is genuinely new.
+    // is the boundary — anything after it is genuinely new.  Walk back from
+    // the tail: new bars are at the end, so this stops after added+1 steps.
     const oldLastTime = lastClosedTime[tf];
-    const addedBars   = [];
-    let   added       = 0;
-    for (const bar of closed) {
-      if (bar.time > oldLastTime) {
-        store[tf].push(bar);
-        addedBars.push(bar);
-        added++;
-      }
-    }
+    let   start       = n;
+    while (start > 0 && closed.time[start - 1] > oldLastTime) start--;
+    const addedBars = sliceCols(closed, start, n);
+    const added     = n - start;
+
     // Persist new closed bars to DB (fire-and-forget, non-blocking)
     candlesRepo.insertCandles(tf, addedBars);
 
-    // Trim to TF_HISTORY[tf] to avoid unbounded growth
-    if (store[tf].length > TF_HISTORY[tf]) {
-      store[tf] = store[tf].slice(-TF_HISTORY[tf]);
-    }
+    // Bounded append: older bars beyond TF_HISTORY[tf] fall out of view
+    appendBars(tf, addedBars);
     lastClosedTime[tf] = newest.time;
 
+    if (ROLLUP[tf]) rollUp(tf, ROLLUP[tf]);
+
     const latestISO = new Date(newest.time).toISOString();
-    log.info(`[Candles] ${tf}: ${added} new bar(s) — close=${newest.close.toFixed(4)} at ${latestISO} | store=${store[tf].length}`);
-  } else {
+    log.info(`[Candles] ${tf}: ${added} new bar(s) — close=${newest.close.toFixed(4)} at ${latestISO} | store=${size(store[tf])}`);
+  } else if (log.isDebug()) {
     log.debug(`[Candles] ${tf}: no new bar yet (last closed: ${new Date(lastClosedTime[tf]).toISOString()})`);
   }
 
   return hadNewClose;
 }
 
+// ── Local resampling ────────────────────────────────────────────
+
+// In-flight direct fetch per coarse TF while it has no anchor bar
+const _anchorFetch = { M15: null, H4: null };
+
+/**
+ * Build any newly completed coarse bars from the fine store and append
+ * them to the coarse store (open=first, high=max, low=min, close=last,
+ * vol=sum, time=bucket open).
+ *
+ * Bucket boundaries are anchored on the coarse TF's last loaded bar, so
+ * whatever phase the broker uses for its H4 sessions is preserved.  A
+ * bucket is emitted once its final fine bar has closed, or once a later
+ * fine bar shows the market has moved past it (session gaps).
+ *
+ * With no coarse bar loaded yet (empty startup fetch) there is nothing to
+ * anchor on, so its full history is fetched directly instead; once that
+ * returns a bar, later closes roll up as usual.
+ *
+ * @param {'M5'|'H1'}  fineTf
+ * @param {'M15'|'H4'} coarseTf
+ */
+function rollUp(fineTf, coarseTf) {
+  if (!activeTFs().includes(coarseTf)) return;
+  const anchor = lastClosedTime[coarseTf];
+  if (!anchor) {
+    if (_anchorFetch[coarseTf]) return;
+    log.warn(`[Candles] ${coarseTf}: no bars to anchor roll-up from ${fineTf} — reloading ${coarseTf} history`);
+    _anchorFetch[coarseTf] = fetchFull(coarseTf, TF_HISTORY[coarseTf])
+      .catch(e => log.warn(`[Candles] ${coarseTf}: history reload failed: ${e.message}`))
+      .finally(() => { _anchorFetch[coarseTf] = null; });
+    return;
+  }
+
+  const span     = TF_MS[coarseTf];
+  const fine     = store[fineTf];
+  const n        = size(fine);
+  const lastFine = fine.time[n - 1];
+
+  // First fine bar at or after the next coarse bucket
+  let i = n;
+  while (i > 0 && fine.time[i - 1] >= anchor + span) i--;
+
+  const rows = [];
+  while (i < n) {
+    const bucket = fine.time[i] - ((fine.time[i] - anchor) % span);
+    const end    = bucket + span;
+    if (lastFine < end - TF_MS[fineTf]) break;   // bucket still forming
+
+    const open = fine.open[i];
+    let   high = fine.high[i];
+    let   low  = fine.low[i];
+    let   vol  = 0;
+    let   j    = i;
+    for (; j < n && fine.time[j] < end; j++) {
+      if (fine.high[j] > high) high = fine.high[j];
+      if (fine.low[j]  < low)  low  = fine.low[j];
+      vol += fine.vol[j];
+    }
+    rows.push([bucket, open, high, low, fine.close[j - 1], vol]);
+    i = j;
+  }
+  if (!rows.length) return;
+
+  const bars = allocCols(rows.length);
+  rows.forEach((r, k) => FIELDS.forEach((f, c) => { bars[f][k] = r[c]; }));
+
+  candlesRepo.insertCandles(coarseTf, bars);
+  appendBars(coarseTf, bars);
+  lastClosedTime[coarseTf] = bars.time[rows.length - 1];
+
+  const latest = barAt(bars, -1);
+  log.info(
+    `[Candles] ${coarseTf}: ${rows.length} bar(s) built from ${fineTf} — close=${latest.close.toFixed(4)} ` +
+    `at ${new Date(latest.time).toISOString()} | store=${size(store[coarseTf])}`
+  );
+}
+
+// ── Incremental indicators ──────────────────────────────────────
+// Last EMA / ATR value per (tf, period), seeded from the full store on the
+// first request and then advanced one recurrence step per new bar, so a
+// candle close costs O(1) per indicator instead of a full-history pass.
+// Dropped whenever the TF is reloaded from scratch.
+
+const _emaState  = {};   // 'tf:period'   → { value, time }
+const _atrState  = {};   // 'tf:period'   → { value, time }
+const _rollState = {};   // 'tf:lookback' → { re: RollingExtrema, time }
+
+function resetIndicatorState(tf) {
+  for (const st of [_emaState, _atrState, _rollState]) {
+    for (const key of Object.keys(st)) if (key.startsWith(`${tf}:`)) delete st[key];
+  }
+  _memo[tf]?.clear();
+}
+
+/**
+ * Index of the first bar after `time`, or -1 if the state is stale
+ * (its bar has already been trimmed out of the store).
+ */
+function _firstAfter(c, time) {
+  let i = size(c);
+  while (i > 0 && c.time[i - 1] > time) i--;
+  return i === 0 && c.time[0] > time ? -1 : i;
+}
+
+/**
+ * Latest EMA(period) of closes for a timeframe.
+ * @param {'M1'|'M5'|'M15'|'H1'|'H4'} tf
+ * @param {number} period
+ * @returns {number|null}
+ */
+function ema(tf, period) {
+  const c = store[tf];
+  const n = size(c);
+  if (n < period) return null;
+
+  const key = `${tf}:${period}`;
+  const st  = _emaState[key];
+  const i   = st ? _firstAfter(c, st.time) : -1;
+  if (i < 0) {
+    const value = ind.ema(c.close, period);
+    _emaState[key] = { value, time: c.time[n - 1] };
+    return value;
+  }
+
+  const k = 2 / (period + 1);
+  for (let j = i; j < n; j++) st.value = c.close[j] * k + st.value * (1 - k);
+  st.time = c.time[n - 1];
+  return st.value;
+}
+
+/**
+ * Latest ATR(period) for a timeframe (Wilder's RMA of true range).
+ * @param {'M1'|'M5'|'M15'|'H1'|'H4'} tf
+ * @param {number} period
+ * @returns {number|null}
+ */
+function atr(tf, period) {
+  const c = store[tf];
+  const n = size(c);
+  if (n < period) return null;
+
+  const key = `${tf}:${period}`;
+  const st  = _atrState[key];
+  const i   = st ? _firstAfter(c, st.time) : -1;
+  if (i < 1) {
+    const value = ind.atr(c.high, c.low, c.close, period);
+    _atrState[key] = { value, time: c.time[n - 1] };
+    return value;
+  }
+
+  for (let j = i; j < n; j++) {
+    st.value = (st.value * (period - 1) + ind.trueRangeAt(c.high, c.low, c.close, j)) / period;
+  }
+  st.time = c.time[n - 1];
+  return st.value;
+}
+
+/**
+ * Highest high / lowest low of the `lookback` bars *before* the latest
+ * closed bar — the structure levels a BOS has to clear.  Backed by a
+ * RollingExtrema per (tf, lookback) that is fed each bar once.
+ * @param {'M1'|'M5'|'M15'|'H1'|'H4'} tf
+ * @param {number} lookback
+ * @returns {ind.RollingExtrema}
+ */
+function priorExtrema(tf, lookback) {
+  const c    = store[tf];
+  const upto = size(c) - 1;          // exclusive: skip the latest bar
+  const key  = `${tf}:${lookback}`;
+  let   st   = _rollState[key];
+  let   i    = st ? _firstAfter(c, st.time) : -1;
+
+  if (i < 0) {
+    st = _rollState[key] = { re: new ind.RollingExtrema(lookback), time: -Infinity };
+    i  = Math.max(0, upto - lookback);
+  }
+  for (; i < upto; i++) {
+    st.re.push(c.high[i], c.low[i]);
+    st.time = c.time[i];
+  }
+  return st.re;
+}
+
+// ── Registered streams ──────────────────────────────────────────
+// Indicators registered here are advanced as bars are appended, so their
+// state is always current when strategy code reads it via ema()/atr()/
+// priorExtrema() — the read is then a lookup with no bars to catch up on.
+
+const _streams = {};   // tf → { ema:number[], atr:number[], extrema:number[] }
+
+/**
+ * Keep the given indicators updated on every append to this TF.
+ * Seeds them immediately if the TF already holds history.
+ * @param {'M1'|'M5'|'M15'|'H1'|'H4'} tf
+ * @param {{ ema?:number[], atr?:number[], extrema?:number[] }} spec
+ *        EMA / ATR periods and priorExtrema lookbacks
+ */
+function register(tf, { ema: emas = [], atr: atrs = [], extrema = [] } = {}) {
+  const s = _streams[tf] || (_streams[tf] = { ema: [], atr: [], extrema: [] });
+  for (const p of emas)    if (!s.ema.includes(p))     s.ema.push(p);
+  for (const p of atrs)    if (!s.atr.includes(p))     s.atr.push(p);
+  for (const p of extrema) if (!s.extrema.includes(p)) s.extrema.push(p);
+  _advanceStreams(tf);
+}
+
+function _advanceStreams(tf) {
+  const s = _streams[tf];
+  if (!s || !size(store[tf])) return;
+  for (const p of s.ema)     ema(tf, p);
+  for (const p of s.atr)     atr(tf, p);
+  for (const p of s.extrema) priorExtrema(tf, p);
+}
+
+// ── Per-bar memo ────────────────────────────────────────────────
+// Indicators without an incremental form (RSI, ATR ratio, EMA slope…) are
+// pure functions of the store, so each is computed at most once per closed
+// bar.  Entries are dropped whenever the TF gains or reloads bars.
+
+const _memo = {};   // tf → Map(key → value)
+
+/**
+ * Return fn(candles) for this TF, reusing the result until the next bar.
+ * @param {'M1'|'M5'|'M15'|'H1'|'H4'} tf
+ * @param {string}   key  Identifies the indicator and its parameters
+ * @param {(c: Candles) => any} fn
+ */
+function memo(tf, key, fn) {
+  const m = _memo[tf] || (_memo[tf] = new Map());
+  if (m.has(key)) return m.get(key);
+  const value = fn(store[tf]);
+  m.set(key, value);
+  return value;
+}
+
 // ── Accessors ───────────────────────────────────────────────────
 
 /**
- * Get the closed-candle array for a timeframe.
+ * Get the closed candles for a timeframe, column-wise.
+ * Treat the returned arrays as read-only — they are the live store.
  * @param {'M5'|'M15'|'H1'|'H4'} tf
- * @returns {{ time:number, open:number, high:number, low:number, close:number, vol:number }[]}
+ * @returns {Candles}
  */
 function get(tf) {
   return store[tf];
 }
 
-function sleep(ms) { return new Promise(r => setTimeout(r, ms)); }
-
-module.exports = { loadHistory, update, get };
+module.exports = {
+  loadHistory, update, get, size, barAt, lastBar, sliceCols, countAfter,
+  register, ema, atr, priorExtrema, memo,
+};
@@ -155,9 +155,8 @@ const cfg = {
   TICK_POLL_MS: 5_000,    // position management / bid-ask check
   M1_POLL_MS:   15_000,   // M1 candle update (for micro-confirm)
   M5_POLL_MS:   30_000,   // M5 candle close detection
-  M15_POLL_MS:  60_000,   // M15 trend update
   H1_POLL_MS:   5 * 60_000,   // H1 candle close (swing)
-  H4_POLL_MS:   20 * 60_000,  // H4 trend update (swing)
+  POLL_ALIGN_OFFSET_MS: 2_000,  // candle polls fire this long after each UTC grid point
 
   // ── Session auto-refresh ──────────────────────────────────
   SESSION_REFRESH_MS: 540_000,   // 9 minutes
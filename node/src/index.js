@@ -11,14 +11,14 @@ const state      = require('./state');
 const strategy   = require('./strategy');
 const cfg        = require('./config');
 const log        = require('./logger');
-const ind        = require('./indicators');
 const telegram   = require('./telegram');
 const db         = require('./db');
 const trainer    = require('./trainerRunner');
 const quotesRepo = require('./repo/quotesRepo');
 
 let shutting = false;
-const timers = [];
+const timers  = [];
+const aligned = [];   // everyAligned() loops — { handle } re-armed each run
 
 // ── Tick quote buffer ──────────────────────────────────────────
 // Bid/ask ticks are accumulated here and flushed to DB in one batch
@@ -73,6 +73,7 @@ async function main() {
   // Step 4: load candle history for all active TFs
   log.info('[Main] Loading candle history...');
   await cs.loadHistory();
+  strategy.warmUp();
   log.info('[Main] Candle history ready.');
 
   // Step 5: adopt any positions already open on the platform (Bug #6 fix)
@@ -89,9 +90,7 @@ async function main() {
   let tickBusy   = false;
   let m1Busy     = false;
   let m5Busy     = false;
-  let m15Busy    = false;
   let h1Busy     = false;
-  let h4Busy     = false;
   let reconcBusy = false;
 
   // ── Tick loop: position management + live price display every 5 s ──
@@ -131,17 +130,21 @@ async function main() {
     }, cfg.QUOTE_FLUSH_MS));
   }
 
+  // Candle polls run on the wall-clock grid (every N s, offset a little
+  // past each boundary) so a fetch lands just after each bar closes.
+
   // ── M1 poll: keep micro-confirm data current every 15 s ──
-  timers.push(setInterval(async () => {
+  everyAligned(cfg.M1_POLL_MS, cfg.POLL_ALIGN_OFFSET_MS, async () => {
     if (shutting || m1Busy) return;
     m1Busy = true;
     try { await cs.update('M1'); }
     catch (e) { if (!shutting) log.warn(`[M1 Poll] Error: ${e.message}`); }
     finally { m1Busy = false; }
-  }, cfg.M1_POLL_MS));
+  });
 
   // ── M5 poll: detect candle close every 30 s ──
-  timers.push(setInterval(async () => {
+  // M15 bars are built from M5 inside cs.update('M5') — no separate poll.
+  everyAligned(cfg.M5_POLL_MS, cfg.POLL_ALIGN_OFFSET_MS, async () => {
     if (shutting || m5Busy) return;
     m5Busy = true;
     try {
@@ -155,20 +158,12 @@ async function main() {
     } finally {
       m5Busy = false;
     }
-  }, cfg.M5_POLL_MS));
-
-  // ── M15 poll: keep trend filter current ──
-  timers.push(setInterval(async () => {
-    if (shutting || m15Busy) return;
-    m15Busy = true;
-    try { await cs.update('M15'); }
-    catch (e) { if (!shutting) log.warn(`[M15 Poll] Error: ${e.message}`); }
-    finally { m15Busy = false; }
-  }, cfg.M15_POLL_MS));
+  });
 
   // ── H1 poll: always active — feeds the H1 macro alignment gate ──
   // When swing mode is on, also triggers onH1Close() swing logic.
-  timers.push(setInterval(async () => {
+  // H4 bars are built from H1 inside cs.update('H1') — no separate poll.
+  everyAligned(cfg.H1_POLL_MS, cfg.POLL_ALIGN_OFFSET_MS, async () => {
     if (shutting || h1Busy) return;
     h1Busy = true;
     try {
@@ -182,18 +177,7 @@ async function main() {
     } finally {
       h1Busy = false;
     }
-  }, cfg.H1_POLL_MS));
-
-  // ── H4 poll: swing trend filter (only when SWING_ENABLED) ──
-  if (cfg.swingEnabled) {
-    timers.push(setInterval(async () => {
-      if (shutting || h4Busy) return;
-      h4Busy = true;
-      try { await cs.update('H4'); }
-      catch (e) { if (!shutting) log.warn(`[H4 Poll] Error: ${e.message}`); }
-      finally { h4Busy = false; }
-    }, cfg.H4_POLL_MS));
-  }
+  });
 
   // ── Platform reconciliation every 60 s (Fix #5) ──
   // Cross-checks bot-tracked positions against Capital.com and removes
@@ -233,6 +217,33 @@ async function main() {
   log.info('[Main] GoldBot is running. Press Ctrl+C to stop.');
 }
 
+// ══════════════════════════════════════════════════════════════
+// Aligned scheduling
+// ══════════════════════════════════════════════════════════════
+
+/**
+ * Run fn at every UTC multiple of periodMs, plus offsetMs.
+ * Each run is armed from the absolute deadline rather than from when the
+ * previous run finished, so the loop stays on the candle-close grid
+ * instead of drifting; deadlines missed while the process was stalled
+ * are skipped, not replayed.
+ */
+function everyAligned(periodMs, offsetMs, fn) {
+  const loop = { handle: null, deadline: 0 };
+  const arm  = () => {
+    const now = Date.now();
+    const ref = Math.max(now, loop.deadline);   // never re-arm the same slot
+    loop.deadline = Math.floor((ref - offsetMs) / periodMs + 1) * periodMs + offsetMs;
+    loop.handle   = setTimeout(() => {
+      if (shutting) return;
+      arm();
+      fn();
+    }, loop.deadline - now);
+  };
+  arm();
+  aligned.push(loop);
+}
+
 // ══════════════════════════════════════════════════════════════
 // Status log
 // ══════════════════════════════════════════════════════════════
@@ -276,17 +287,12 @@ function logStatus() {
   try {
     const m15 = cs.get('M15');
     const m5  = cs.get('M5');
-    if (m15.length >= cfg.EMA_TREND_PERIOD && m5.length >= cfg.EMA_PULLBACK_PERIOD) {
-      const closes15 = m15.map(c => c.close);
-      const closes5  = m5.map(c => c.close);
-      const highs5   = m5.map(c => c.high);
-      const lows5    = m5.map(c => c.low);
+    if (cs.size(m15) >= cfg.EMA_TREND_PERIOD && cs.size(m5) >= cfg.EMA_PULLBACK_PERIOD) {
+      const ema200m15 = cs.ema('M15', cfg.EMA_TREND_PERIOD);
+      const ema50m5   = cs.ema('M5',  cfg.EMA_PULLBACK_PERIOD);
+      const atrM5     = cs.atr('M5',  cfg.ATR_PERIOD);
 
-      const ema200m15 = ind.ema(closes15, cfg.EMA_TREND_PERIOD);
-      const ema50m5   = ind.ema(closes5,  cfg.EMA_PULLBACK_PERIOD);
-      const atrM5     = ind.atr(highs5, lows5, closes5, cfg.ATR_PERIOD);
-
-      const m15close  = m15[m15.length - 1].close;
+      const m15close  = m15.close[cs.size(m15) - 1];
       const trend     = m15close > ema200m15 ? 'UP' : m15close < ema200m15 ? 'DOWN' : 'NONE';
 
       log.info(
@@ -301,14 +307,25 @@ function logStatus() {
 // Daily reset scheduler
 // ══════════════════════════════════════════════════════════════
 
-function scheduleMidnightReset() {
-  const now             = new Date();
-  const nextMidnightUTC = new Date(
-    Date.UTC(now.getUTCFullYear(), now.getUTCMonth(), now.getUTCDate() + 1)
-  );
-  const msUntilMidnight = nextMidnightUTC - now;
+const DAY_MS = 24 * 60 * 60_000;
 
-  setTimeout(async () => {
+let _midnightTimer = null;
+let _trainerTimer  = null;
+
+function nextMidnightUTC(ts) {
+  const d = new Date(ts);
+  return Date.UTC(d.getUTCFullYear(), d.getUTCMonth(), d.getUTCDate() + 1);
+}
+
+/**
+ * Arm a one-shot timer for the given UTC midnight (default: the next one).
+ * Each run re-arms for target + 24h, so the chain stays pinned to midnight
+ * instead of re-deriving from a callback that may fire slightly early/late.
+ */
+function scheduleMidnightReset(target = nextMidnightUTC(Date.now())) {
+  const msUntilMidnight = Math.max(0, target - Date.now());
+
+  _midnightTimer = setTimeout(async () => {
     if (shutting) return;
     log.separator('─');
     log.info('[Main] UTC midnight — daily reset...');
@@ -319,12 +336,15 @@ function scheduleMidnightReset() {
       log.info(`[Main] Account balance at reset: $${eq.toFixed(2)}`);
     } catch { /* non-fatal */ }
     state.dailyReset(eq);
-    scheduleMidnightReset();   // reschedule for the next day
+
+    // Reschedule for the next day; if the host slept past it, resync.
+    const next = target + DAY_MS;
+    scheduleMidnightReset(next > Date.now() ? next : nextMidnightUTC(Date.now()));
 
     // Run ML training pipeline 30 min after midnight (non-blocking, non-fatal).
     // Gives candles time to close before labelling + retraining.
     if (cfg.DB_URL) {
-      setTimeout(() => {
+      _trainerTimer = setTimeout(() => {
         if (!shutting) trainer.runNightlyTrainer();
       }, 30 * 60_000);
       log.info('[Main] Nightly trainer scheduled in 30 min.');
@@ -344,6 +364,9 @@ async function gracefulShutdown(signal) {
   log.separator('─');
   log.warn(`[Main] Shutting down (${signal})...`);
   timers.forEach(t => clearInterval(t));
+  aligned.forEach(l => clearTimeout(l.handle));
+  clearTimeout(_midnightTimer);
+  clearTimeout(_trainerTimer);
   await telegram.notifyBotStopped(signal).catch(() => {});
   await api.destroySession();
   log.info('[Main] GoldBot stopped. Goodbye!');
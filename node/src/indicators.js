@@ -5,82 +5,72 @@
 
 /**
  * Compute full EMA series for an array of values.
- * First (period-1) elements are null (seeding phase).
- * @param {number[]} values
- * @param {number}   period
- * @returns {(number|null)[]}
+ * First (period-1) elements are NaN (seeding phase).
+ * @param {ArrayLike<number>} values
+ * @param {number}            period
+ * @returns {Float64Array}
  */
 function computeEMA(values, period) {
-  const out = new Array(values.length).fill(null);
-  if (values.length < period) return out;
+  const n   = values.length;
+  const out = new Float64Array(n).fill(NaN);
+  if (n < period) return out;
 
   const k = 2 / (period + 1);
+  const j = 1 - k;
 
   // Seed with SMA of the first `period` values
   let sum = 0;
   for (let i = 0; i < period; i++) sum += values[i];
-  out[period - 1] = sum / period;
+  let prev = sum / period;
+  out[period - 1] = prev;
 
-  for (let i = period; i < values.length; i++) {
-    out[i] = values[i] * k + out[i - 1] * (1 - k);
+  for (let i = period; i < n; i++) {
+    prev   = values[i] * k + prev * j;
+    out[i] = prev;
   }
   return out;
 }
 
 /**
- * Return the most recent EMA value (last non-null element).
- * @param {number[]} values
- * @param {number}   period
+ * Return the most recent EMA value.
+ * Same SMA-seeded recurrence as computeEMA, but carried in a scalar —
+ * callers only need the last value, so no series is allocated.
+ * @param {ArrayLike<number>} values
+ * @param {number}            period
  * @returns {number|null}
  */
 function ema(values, period) {
-  const arr = computeEMA(values, period);
-  for (let i = arr.length - 1; i >= 0; i--) {
-    if (arr[i] !== null) return arr[i];
-  }
-  return null;
-}
+  const n = values.length;
+  if (!n || n < period) return null;
 
-/**
- * Compute True Range for each bar.
- * @param {number[]} highs
- * @param {number[]} lows
- * @param {number[]} closes
- * @returns {number[]}
- */
-function trueRanges(highs, lows, closes) {
-  return highs.map((h, i) => {
-    const hl = h - lows[i];
-    if (i === 0) return hl;
-    return Math.max(hl, Math.abs(h - closes[i - 1]), Math.abs(lows[i] - closes[i - 1]));
-  });
+  const k = 2 / (period + 1);
+  const j = 1 - k;
+
+  let sum = 0;
+  for (let i = 0; i < period; i++) sum += values[i];
+  let e = sum / period;
+
+  for (let i = period; i < n; i++) e = values[i] * k + e * j;
+  return e;
 }
 
-/**
- * Wilder's Smoothed Moving Average (RMA) — the correct smoothing for ATR.
- * Uses alpha = 1/period (versus EMA's 2/(period+1)), matching TradingView,
- * MT4/5, and most charting platforms.
- *
- * @param {number[]} values
- * @param {number}   period
- * @returns {number|null}
- */
-function wilderRMA(values, period) {
-  if (values.length < period) return null;
-  // Seed with SMA of the first `period` values
-  let rma = 0;
-  for (let i = 0; i < period; i++) rma += values[i];
-  rma /= period;
-  // Apply Wilder smoothing for the rest
-  for (let i = period; i < values.length; i++) {
-    rma = (rma * (period - 1) + values[i]) / period;
-  }
-  return rma;
+/** True range of bar i (i >= 1) against the previous close. */
+function trueRangeAt(highs, lows, closes, i) {
+  const h  = highs[i];
+  const l  = lows[i];
+  const pc = closes[i - 1];
+  let   r  = h - l;
+  const up = h > pc ? h - pc : pc - h;
+  const dn = l > pc ? l - pc : pc - l;
+  if (up > r) r = up;
+  if (dn > r) r = dn;
+  return r;
 }
 
 /**
  * Return the most recent ATR value using Wilder's RMA smoothing.
  * This matches the ATR shown in TradingView / MT4 / MT5.
+ * Single pass: true range and smoothing are fused, nothing is allocated.
  *
  * @param {number[]} highs
  * @param {number[]} lows
@@ -89,38 +79,51 @@ function wilderRMA(values, period) {
  * @returns {number|null}
  */
 function atr(highs, lows, closes, period) {
-  return wilderRMA(trueRanges(highs, lows, closes), period);
+  const n = highs.length;
+  if (n < period) return null;
+
+  // Seed with SMA of the first `period` true ranges
+  let rma = highs[0] - lows[0];
+  for (let i = 1; i < period; i++) rma += trueRangeAt(highs, lows, closes, i);
+  rma /= period;
+
+  for (let i = period; i < n; i++) {
+    rma = (rma * (period - 1) + trueRangeAt(highs, lows, closes, i)) / period;
+  }
+  return rma;
 }
 
 /**
  * Compute ATR series (same length as input) using Wilder's RMA with SMA seed.
- * Returns nulls for the first (period-1) elements.
+ * True range and smoothing are fused into one pass over the bars, writing
+ * straight into the output — no intermediate true-range array.
+ * Returns NaN for the first (period-1) elements.
  *
- * @param {number[]} highs
- * @param {number[]} lows
- * @param {number[]} closes
+ * @param {ArrayLike<number>} highs
+ * @param {ArrayLike<number>} lows
+ * @param {ArrayLike<number>} closes
  * @param {number}   period
- * @returns {(number|null)[]}
+ * @returns {Float64Array}
  */
 function computeATRSeries(highs, lows, closes, period) {
-  const tr  = trueRanges(highs, lows, closes);
-  const out = new Array(tr.length).fill(null);
-  if (tr.length < period) return out;
+  const n   = highs.length;
+  const out = new Float64Array(n).fill(NaN);
+  if (n < period) return out;
 
-  let rma = 0;
-  for (let i = 0; i < period; i++) rma += tr[i];
+  let rma = highs[0] - lows[0];
+  for (let i = 1; i < period; i++) rma += trueRangeAt(highs, lows, closes, i);
   rma /= period;
   out[period - 1] = rma;
 
-  for (let i = period; i < tr.length; i++) {
-    rma = (rma * (period - 1) + tr[i]) / period;
+  for (let i = period; i < n; i++) {
+    rma = (rma * (period - 1) + trueRangeAt(highs, lows, closes, i)) / period;
     out[i] = rma;
   }
   return out;
 }
 
 /**
- * Compute RSI series using Wilder's smoothing (same alpha as wilderRMA).
+ * Compute RSI series using Wilder's smoothing (alpha = 1/period, as in ATR).
  * Returns nulls for the first `period` elements (seeding phase).
  *
  * @param {number[]} values
@@ -155,54 +158,53 @@ function computeRSI(values, period) {
 
 /**
  * Return the most recent RSI value.
- * @param {number[]} values
+ * Same Wilder recurrence as computeRSI, carried in scalars — no series.
+ * @param {ArrayLike<number>} values
  * @param {number}   period
  * @returns {number|null}
  */
 function rsi(values, period = 14) {
-  const arr = computeRSI(values, period);
-  for (let i = arr.length - 1; i >= 0; i--) {
-    if (arr[i] !== null) return arr[i];
+  const n = values.length;
+  if (n <= period) return null;
+
+  let avgGain = 0, avgLoss = 0;
+  for (let i = 1; i <= period; i++) {
+    const diff = values[i] - values[i - 1];
+    if (diff > 0) avgGain += diff; else avgLoss -= diff;
   }
-  return null;
-}
+  avgGain /= period;
+  avgLoss /= period;
 
-/**
- * Compute SMA series.
- * @param {number[]} values
- * @param {number}   period
- * @returns {(number|null)[]}
- */
-function computeSMA(values, period) {
-  const out = new Array(values.length).fill(null);
-  if (values.length < period) return out;
-  let sum = 0;
-  for (let i = 0; i < period; i++) sum += values[i];
-  out[period - 1] = sum / period;
-  for (let i = period; i < values.length; i++) {
-    sum += values[i] - values[i - period];
-    out[i] = sum / period;
+  for (let i = period + 1; i < n; i++) {
+    const diff = values[i] - values[i - 1];
+    avgGain = (avgGain * (period - 1) + (diff > 0 ? diff : 0)) / period;
+    avgLoss = (avgLoss * (period - 1) + (diff < 0 ? -diff : 0)) / period;
   }
-  return out;
+  return avgLoss === 0 ? 100 : 100 - 100 / (1 + avgGain / avgLoss);
 }
 
 /**
  * Bollinger Band width = 4σ / SMA(period).
  * A wider band signals higher volatility relative to price.
+ * Two in-place passes over the last `period` values — nothing is copied.
  * Returns null if not enough data.
  *
- * @param {number[]} values
+ * @param {ArrayLike<number>} values
  * @param {number}   period
  * @returns {number|null}
  */
 function bollingerWidth(values, period = 20) {
-  if (values.length < period) return null;
-  const smaArr = computeSMA(values, period);
-  const smaVal = smaArr[values.length - 1];
-  if (smaVal === null || smaVal === 0) return null;
-  const slice   = values.slice(-period);
-  const variance = slice.reduce((acc, v) => acc + (v - smaVal) ** 2, 0) / period;
-  return (4 * Math.sqrt(variance)) / smaVal;
+  const n = values.length;
+  if (n < period) return null;
+
+  let sum = 0;
+  for (let i = n - period; i < n; i++) sum += values[i];
+  const smaVal = sum / period;
+  if (smaVal === 0) return null;
+
+  let sq = 0;
+  for (let i = n - period; i < n; i++) sq += (values[i] - smaVal) ** 2;
+  return (4 * Math.sqrt(sq / period)) / smaVal;
 }
 
 /**
@@ -218,16 +220,24 @@ function bollingerWidth(values, period = 20) {
  * @returns {number|null}
  */
 function atrRatio(highs, lows, closes, period = 14, smaPeriod = 50) {
-  const series = computeATRSeries(highs, lows, closes, period);
-  // Collect the last smaPeriod non-null values
-  const recent = [];
-  for (let i = series.length - 1; i >= 0 && recent.length < smaPeriod; i--) {
-    if (series[i] !== null) recent.unshift(series[i]);
+  const n = highs.length;
+  // ATR is seeded at bar period-1; need smaPeriod seeded values after that
+  if (n - (period - 1) < smaPeriod) return null;
+
+  // One Wilder pass (as computeATRSeries), summing the last smaPeriod values
+  // as they are produced instead of storing the series.
+  const from = n - smaPeriod;
+  let rma = highs[0] - lows[0];
+  for (let i = 1; i < period; i++) rma += trueRangeAt(highs, lows, closes, i);
+  rma /= period;
+
+  let sum = period - 1 >= from ? rma : 0;
+  for (let i = period; i < n; i++) {
+    rma = (rma * (period - 1) + trueRangeAt(highs, lows, closes, i)) / period;
+    if (i >= from) sum += rma;
   }
-  if (recent.length < smaPeriod) return null;
-  const smaAtr = recent.reduce((a, b) => a + b, 0) / smaPeriod;
-  const current = series[series.length - 1];
-  return (smaAtr !== 0 && current !== null) ? current / smaAtr : null;
+  const smaAtr = sum / smaPeriod;
+  return smaAtr !== 0 ? rma / smaAtr : null;
 }
 
 /**
@@ -235,7 +245,7 @@ function atrRatio(highs, lows, closes, period = 14, smaPeriod = 50) {
  * Positive = rising EMA, negative = falling.
  * Returns null if not enough data.
  *
- * @param {number[]} values
+ * @param {ArrayLike<number>} values
  * @param {number}   emaPeriod
  * @param {number}   lookback    Number of bars to measure slope over
  * @param {number}   atrVal      Current ATR for normalisation
@@ -243,41 +253,106 @@ function atrRatio(highs, lows, closes, period = 14, smaPeriod = 50) {
  */
 function emaSlope(values, emaPeriod, lookback, atrVal) {
   if (!atrVal || atrVal === 0) return null;
-  const series = computeEMA(values, emaPeriod);
-  if (series.length < lookback + 1) return null;
-  const current = series[series.length - 1];
-  const prev    = series[series.length - 1 - lookback];
-  if (current === null || prev === null) return null;
-  return (current - prev) / (lookback * atrVal);
+  const n    = values.length;
+  const back = n - 1 - lookback;           // index of the earlier EMA value
+  if (back < emaPeriod - 1) return null;   // not seeded yet (or too short)
+
+  // Scalar EMA recurrence (as in ema()), noting the value at `back`
+  const k = 2 / (emaPeriod + 1);
+  const j = 1 - k;
+  let sum = 0;
+  for (let i = 0; i < emaPeriod; i++) sum += values[i];
+  let e    = sum / emaPeriod;
+  let prev = e;
+  for (let i = emaPeriod; i < n; i++) {
+    e = values[i] * k + e * j;
+    if (i === back) prev = e;
+  }
+  return (e - prev) / (lookback * atrVal);
 }
 
 /**
- * Highest high of the last N candles in the array.
+ * Highest high of the last N candles in the array (scanned in place, no copy).
  * Used with `prevCandles` (i.e. already excludes the current trigger bar).
- * @param {number[]} highs
+ * @param {ArrayLike<number>} highs
  * @param {number}   n
  * @returns {number}
  */
 function highestHigh(highs, n) {
-  return Math.max(...highs.slice(-n));
+  let hh = -Infinity;
+  for (let i = Math.max(0, highs.length - n); i < highs.length; i++) {
+    if (highs[i] > hh) hh = highs[i];
+  }
+  return hh;
 }
 
 /**
- * Lowest low of the last N candles in the array.
- * @param {number[]} lows
+ * Lowest low of the last N candles in the array (scanned in place, no copy).
+ * @param {ArrayLike<number>} lows
  * @param {number}   n
  * @returns {number}
  */
 function lowestLow(lows, n) {
-  return Math.min(...lows.slice(-n));
+  let ll = Infinity;
+  for (let i = Math.max(0, lows.length - n); i < lows.length; i++) {
+    if (lows[i] < ll) ll = lows[i];
+  }
+  return ll;
+}
+
+/**
+ * Sliding-window highest high / lowest low over the last `window` pushed
+ * bars, kept with two monotonic deques so push/max/min are amortised O(1).
+ */
+class RollingExtrema {
+  /** @param {number} window */
+  constructor(window) {
+    this.window = window;
+    this.count  = 0;                      // bars pushed so far
+    this._hiV = []; this._hiI = []; this._hiHead = 0;
+    this._loV = []; this._loI = []; this._loHead = 0;
+  }
+
+  /** Add the next bar's high/low, evicting whatever fell out of the window. */
+  push(high, low) {
+    const i      = this.count++;
+    const expire = i - this.window;
+
+    while (this._hiV.length > this._hiHead && this._hiV[this._hiV.length - 1] <= high) {
+      this._hiV.pop(); this._hiI.pop();
+    }
+    this._hiV.push(high); this._hiI.push(i);
+    while (this._hiI[this._hiHead] <= expire) this._hiHead++;
+
+    while (this._loV.length > this._loHead && this._loV[this._loV.length - 1] >= low) {
+      this._loV.pop(); this._loI.pop();
+    }
+    this._loV.push(low); this._loI.push(i);
+    while (this._loI[this._loHead] <= expire) this._loHead++;
+
+    // Drop consumed heads now and then so the arrays stay ~window long
+    if (this._hiHead > this.window) {
+      this._hiV.splice(0, this._hiHead); this._hiI.splice(0, this._hiHead); this._hiHead = 0;
+    }
+    if (this._loHead > this.window) {
+      this._loV.splice(0, this._loHead); this._loI.splice(0, this._loHead); this._loHead = 0;
+    }
+  }
+
+  /** Highest high in the window (-Infinity when empty). */
+  max() { return this._hiHead < this._hiV.length ? this._hiV[this._hiHead] : -Infinity; }
+
+  /** Lowest low in the window (Infinity when empty). */
+  min() { return this._loHead < this._loV.length ? this._loV[this._loHead] : Infinity; }
 }
 
 module.exports = {
   computeEMA, ema,
-  computeATRSeries, atr,
+  computeATRSeries, atr, trueRangeAt,
   computeRSI, rsi,
   bollingerWidth,
   atrRatio,
   emaSlope,
   highestHigh, lowestLow,
+  RollingExtrema,
 };
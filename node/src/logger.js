@@ -14,11 +14,10 @@ const path = require('path');
 let _stream     = null;
 let _streamDate = '';
 
-function _getStream() {
-  const today = new Date().toISOString().slice(0, 10); // 'YYYY-MM-DD'
+function _getStream(today) {   // today: 'YYYY-MM-DD'
   if (_streamDate !== today || !_stream || _stream.destroyed) {
     if (_stream && !_stream.destroyed) _stream.end();
-    _stream     = fs.createWriteStream(logFilePath(), { flags: 'a' });
+    _stream     = fs.createWriteStream(logFilePath(today), { flags: 'a' });
     _streamDate = today;
     _stream.on('error', () => { _stream = null; }); // self-heal on I/O error
   }
@@ -45,15 +44,14 @@ if (!fs.existsSync(LOGS_DIR)) {
   fs.mkdirSync(LOGS_DIR, { recursive: true });
 }
 
-function logFilePath() {
-  const date = new Date().toISOString().slice(0, 10); // "YYYY-MM-DD"
+function logFilePath(date) {   // date: "YYYY-MM-DD"
   return path.join(LOGS_DIR, `goldbot-${date}.log`);
 }
 
-// ── Timestamp ──────────────────────────────────────────────────
-function ts() {
-  return new Date().toISOString().replace('T', ' ').slice(0, 23) + ' UTC';
-}
+// ── Level filter ───────────────────────────────────────────────
+// LOG_LEVEL=debug|info|warn|error (default: debug).  TRADE lines always print.
+const LEVELS = { debug: 10, info: 20, warn: 30, error: 40 };
+const _level = LEVELS[(process.env.LOG_LEVEL || 'debug').toLowerCase()] ?? LEVELS.debug;
 
 // ── Live line state ────────────────────────────────────────────
 // Tracks whether the current terminal line is a live (no-newline) price ticker.
@@ -61,39 +59,44 @@ function ts() {
 let _liveLine = false;
 
 function _clearLive() {
-  if (_liveLine) {
-    process.stdout.write('\r\x1b[K'); // carriage-return + erase to end of line
-    _liveLine = false;
-  }
+  if (!_liveLine) return '';
+  _liveLine = false;
+  return '\r\x1b[K'; // carriage-return + erase to end of line
 }
 
 // ── Core emit ──────────────────────────────────────────────────
+// One clock read per line: the ISO string supplies both the timestamp
+// and the file-rotation date.
 function emit(color, level, args) {
   const msg       = args.map(a => (typeof a === 'object' ? JSON.stringify(a) : String(a))).join(' ');
-  const timestamp = ts();
+  const iso       = new Date().toISOString();
+  const timestamp = `${iso.slice(0, 10)} ${iso.slice(11, 23)} UTC`;
   const padded    = level.padEnd(5);
 
-  // If the live ticker is on the current line, wipe it first
-  _clearLive();
-
-  // Terminal — coloured
-  process.stdout.write(`${color}[${timestamp}] [${padded}]${C.reset} ${msg}\n`);
+  // Terminal — coloured; wipes the live ticker first if it is on this line
+  process.stdout.write(`${_clearLive()}${color}[${timestamp}] [${padded}]${C.reset} ${msg}\n`);
 
   // File — written via a persistent stream so lines stay in order
-  const s = _getStream();
+  const s = _getStream(iso.slice(0, 10));
   if (s) s.write(`[${timestamp}] [${padded}] ${msg}\n`);
 }
 
 module.exports = {
-  info:  (...a) => emit(C.cyan,           'INFO',  a),
-  warn:  (...a) => emit(C.yellow,         'WARN',  a),
-  error: (...a) => emit(C.red,            'ERROR', a),
+  info:  (...a) => { if (_level <= LEVELS.info)  emit(C.cyan,   'INFO',  a); },
+  warn:  (...a) => { if (_level <= LEVELS.warn)  emit(C.yellow, 'WARN',  a); },
+  error: (...a) => { if (_level <= LEVELS.error) emit(C.red,    'ERROR', a); },
   trade: (...a) => emit(C.green + C.bold, 'TRADE', a),
-  debug: (...a) => emit(C.gray,           'DEBUG', a),
+  debug: (...a) => { if (_level <= LEVELS.debug) emit(C.gray,   'DEBUG', a); },
+
+  /**
+   * True when DEBUG lines are emitted.  Guard hot debug calls with this
+   * so their template strings aren't built only to be discarded.
+   */
+  isDebug: () => _level <= LEVELS.debug,
 
   /** Write a plain separator line — useful for session start / daily reset. */
   separator: (char = '─', width = 54) => {
-    emit(C.gray, 'INFO', [char.repeat(width)]);
+    if (_level <= LEVELS.info) emit(C.gray, 'INFO', [char.repeat(width)]);
   },
 
   /**
@@ -8,8 +8,9 @@
 //   "model_version": "2026-02-24_01",
 //   "feature_names": ["spread_norm", "m15_ema200_dist_atr", ...],
 //   "bias":    -0.12,
-//   "weights": { "spread_norm": 0.8, "m15_ema200_dist_atr": -0.3, ... }
+//   "weights": [0.8, -0.3, ...]          // aligned with feature_names
 // }
+// Older exports store "weights" as a { name: weight } object; both load.
 //
 // score()            → champion model  (acts on trades)
 // scoreChallenger()  → challenger model (shadow — never acts)
@@ -33,12 +34,30 @@ function sigmoid(x) {
   return 1 / (1 + Math.exp(-x));
 }
 
+/**
+ * Pack the model's weights into parallel name / Float64Array vectors once at
+ * load, so scoring is a single indexed loop with no per-call object walk.
+ */
+function _packWeights(m) {
+  if (Array.isArray(m.weights)) {
+    if (m.weights.length !== m.feature_names.length) {
+      throw new Error('weights / feature_names length mismatch');
+    }
+    m._names = m.feature_names;
+    m._w     = Float64Array.from(m.weights);
+  } else {
+    m._names = Object.keys(m.weights);
+    m._w     = Float64Array.from(m._names, n => m.weights[n]);
+  }
+  return m;
+}
+
 function _loadFile(filePath) {
   if (!fs.existsSync(filePath)) return null;
   try {
     const m = JSON.parse(fs.readFileSync(filePath, 'utf8'));
     if (!m.weights || !m.feature_names) throw new Error('Invalid model format');
-    return m;
+    return _packWeights(m);
   } catch (e) {
     log.warn(`[ML] Failed to load ${path.basename(filePath)}: ${e.message}`);
     return null;
@@ -48,11 +67,13 @@ function _loadFile(filePath) {
 function _scoreModel(model, features) {
   if (!model) return null;
 
+  const names = model._names;
+  const w     = model._w;
   let logit = model.bias ?? 0;
-  for (const [name, w] of Object.entries(model.weights)) {
-    const v = features[name];
+  for (let i = 0; i < w.length; i++) {
+    const v = features[names[i]];
     if (v !== undefined && v !== null && isFinite(v)) {
-      logit += w * v;
+      logit += w[i] * v;
     }
   }
 
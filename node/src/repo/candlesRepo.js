@@ -8,25 +8,26 @@ const db  = require('../db');
 const cfg = require('../config');
 
 /**
- * Batch-insert an array of closed candle bars for one timeframe.
+ * Batch-insert closed candle bars for one timeframe.
  * Duplicate (epic, tf, ts) rows are silently ignored (ON CONFLICT).
  *
- * @param {string}   tf    'M1' | 'M5' | 'M15' | 'H1' | 'H4'
- * @param {object[]} bars  Array of { time, open, high, low, close, vol }
+ * @param {string} tf    'M1' | 'M5' | 'M15' | 'H1' | 'H4'
+ * @param {object} bars  Column-wise { time, open, high, low, close, vol } typed arrays
  */
 async function insertCandles(tf, bars) {
-  if (!db.isEnabled() || !bars.length) return;
+  const n = bars.time.length;
+  if (!db.isEnabled() || !n) return;
 
   // Build a multi-row VALUES clause
   const valueClauses = [];
   const params       = [];
   let   idx          = 1;
 
-  for (const b of bars) {
+  for (let i = 0; i < n; i++) {
     valueClauses.push(
       `($${idx++}, $${idx++}, $${idx++}, $${idx++}, $${idx++}, $${idx++}, $${idx++}, $${idx++})`
     );
-    params.push(cfg.EPIC, tf, b.time, b.open, b.high, b.low, b.close, b.vol ?? 0);
+    params.push(cfg.EPIC, tf, bars.time[i], bars.open[i], bars.high[i], bars.low[i], bars.close[i], bars.vol[i]);
   }
 
   const sql = `
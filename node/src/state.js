@@ -14,10 +14,33 @@ let consecutiveLosses = 0;
 let dayStartEquity    = 0;
 
 // ── Setup state ────────────────────────────────────────────
-/** @type {{ active:boolean, direction?:string, createdTime?:number, pullbackExtreme?:number }} */
-let setupScalp = { active: false };
-/** @type {{ active:boolean, direction?:string, createdTime?:number, pullbackExtreme?:number }} */
-let setupSwing = { active: false };
+/**
+ * @typedef {{ active:boolean, direction:?string, createdTime:?number,
+ *             pullbackExtreme:?number, touchType:?string,
+ *             touchPrice:?number, refEma:?number }} Setup
+ */
+
+/**
+ * Build a Setup with every field present in a fixed order, so inactive and
+ * active setups share one object shape and property reads stay monomorphic.
+ * @returns {Setup}
+ */
+function makeSetup(s) {
+  return {
+    active:          s.active,
+    direction:       s.direction       ?? null,
+    createdTime:     s.createdTime     ?? null,
+    pullbackExtreme: s.pullbackExtreme ?? null,
+    touchType:       s.touchType       ?? null,
+    touchPrice:      s.touchPrice      ?? null,
+    refEma:          s.refEma          ?? null,
+  };
+}
+
+/** @type {Setup} */
+let setupScalp = makeSetup({ active: false });
+/** @type {Setup} */
+let setupSwing = makeSetup({ active: false });
 
 // ── Open positions (bot-tracked, complementing platform) ──
 /**
@@ -25,9 +48,79 @@ let setupSwing = { active: false };
  *             entry:number, sl:number, tp1:number, tp2:number,
  *             tp1Done:boolean, dealId:string,
  *             dealReference:string, openedTime:number }} Position
- * @type {Position[]}
+ * Positions are normalised through makePosition() so they all share one
+ * object shape.  Keyed by dealId so add/remove/replace are O(1) instead of a full
+ * filter-and-rebuild of the list.
+ * @type {Map<string, Position>}
  */
-let openPositions = [];
+const openPositions = new Map();
+
+/**
+ * Copy a position into a fixed-shape object.  Positions arrive from several
+ * literals (new entry, adoption, TP1 replacement spreads); building them in
+ * one place keeps the per-tick reads in managePositions on a single shape.
+ * @returns {Position}
+ */
+function makePosition(p) {
+  return {
+    mode:          p.mode,
+    direction:     p.direction,
+    size:          p.size,
+    entry:         p.entry,
+    sl:            p.sl,
+    tp1:           p.tp1,
+    tp2:           p.tp2,
+    tp1Done:       p.tp1Done,
+    dealId:        p.dealId,
+    dealReference: p.dealReference,
+    openedTime:    p.openedTime,
+  };
+}
+
+// ── Exit band (nearest SL/TP levels across open positions) ──
+// BUY positions exit on the bid, SELL positions on the ask.  While the bid
+// sits strictly inside (buyFloor, buyCeil) and the ask inside
+// (sellFloor, sellCeil), no position can have hit SL, TP1 or TP2.
+let buyFloor  = -Infinity;   // highest BUY SL
+let buyCeil   =  Infinity;   // lowest BUY TP1 (pending) / TP2
+let sellFloor = -Infinity;   // highest SELL TP1 (pending) / TP2
+let sellCeil  =  Infinity;   // lowest SELL SL
+
+function _recomputeExitBand() {
+  buyFloor  = -Infinity;
+  buyCeil   =  Infinity;
+  sellFloor = -Infinity;
+  sellCeil  =  Infinity;
+  for (const p of openPositions.values()) {
+    if (p.direction === 'BUY') {
+      buyFloor = Math.max(buyFloor, p.sl);
+      buyCeil  = Math.min(buyCeil, p.tp1Done ? p.tp2 : Math.min(p.tp1, p.tp2));
+    } else {
+      sellCeil  = Math.min(sellCeil, p.sl);
+      sellFloor = Math.max(sellFloor, p.tp1Done ? p.tp2 : Math.max(p.tp1, p.tp2));
+    }
+  }
+}
+
+// ── Exit events ────────────────────────────────────────────
+const EXIT = Object.freeze({ NONE: 0, SL: 1, TP1: 2, TP2: 3 });
+
+/**
+ * Which exit level a position has reached at these quotes, checked in
+ * priority order SL → TP1 (if pending) → TP2.  Distances are signed by
+ * direction so BUY (exits on bid) and SELL (exits on ask) share one set
+ * of comparisons.
+ * @param {Position} pos
+ * @returns {number} One of EXIT.*
+ */
+function exitEvent(pos, bid, ask) {
+  const sign = pos.direction === 'BUY' ? 1 : -1;
+  const px   = sign > 0 ? bid : ask;
+  if ((px - pos.sl) * sign <= 0)                   return EXIT.SL;
+  if (!pos.tp1Done && (px - pos.tp1) * sign >= 0) return EXIT.TP1;
+  if ((px - pos.tp2) * sign >= 0)                  return EXIT.TP2;
+  return EXIT.NONE;
+}
 
 // ══════════════════════════════════════════════════════════
 // Risk gates
@@ -58,7 +151,8 @@ function riskOK() {
  * @param {Position} pos
  */
 function addPosition(pos) {
-  openPositions.push(pos);
+  openPositions.set(pos.dealId, makePosition(pos));
+  _recomputeExitBand();
   tradesToday += 1;
   log.info(`[State] Position added: ${pos.mode} ${pos.direction} dealId=${pos.dealId} | trades_today=${tradesToday}`);
 }
@@ -69,7 +163,8 @@ function addPosition(pos) {
  * @param {Position} pos
  */
 function adoptPosition(pos) {
-  openPositions.push(pos);
+  openPositions.set(pos.dealId, makePosition(pos));
+  _recomputeExitBand();
   log.info(`[State] Position adopted from platform: ${pos.mode} ${pos.direction} dealId=${pos.dealId}`);
 }
 
@@ -78,17 +173,43 @@ function adoptPosition(pos) {
  * Does NOT increment tradesToday.
  */
 function replacePosition(oldDealId, newPos) {
-  openPositions = openPositions.filter(p => p.dealId !== oldDealId);
-  openPositions.push(newPos);
+  openPositions.delete(oldDealId);
+  openPositions.set(newPos.dealId, makePosition(newPos));
+  _recomputeExitBand();
   log.info(`[State] Position replaced: old=${oldDealId} → new=${newPos.dealId}`);
 }
 
 function removePosition(dealId) {
-  openPositions = openPositions.filter(p => p.dealId !== dealId);
+  if (openPositions.delete(dealId)) _recomputeExitBand();
+}
+
+/** Mark TP1 as handled in place (TP1 no longer bounds the exit band). */
+function markTp1Done(dealId) {
+  const pos = openPositions.get(dealId);
+  if (!pos) return;
+  pos.tp1Done = true;
+  _recomputeExitBand();
 }
 
+/**
+ * True when no open position can have reached SL, TP1 or TP2 at these
+ * quotes — a single range check instead of walking every position.
+ */
+function inSafeZone(bid, ask) {
+  return bid > buyFloor && bid < buyCeil && ask > sellFloor && ask < sellCeil;
+}
+
+function hasPosition(dealId) {
+  return openPositions.has(dealId);
+}
+
+/**
+ * Snapshot of the tracked positions.  Callers may add/remove positions
+ * while iterating the returned array without affecting the loop.
+ * @returns {Position[]}
+ */
 function getPositions() {
-  return openPositions;
+  return [...openPositions.values()];
 }
 
 // ══════════════════════════════════════════════════════════
@@ -118,9 +239,9 @@ function updatePnL(pnlUsd, isLoss) {
 // ══════════════════════════════════════════════════════════
 
 function getSetupScalp()   { return setupScalp; }
-function setSetupScalp(s)  { setupScalp = s; }
+function setSetupScalp(s)  { setupScalp = makeSetup(s); }
 function getSetupSwing()   { return setupSwing; }
-function setSetupSwing(s)  { setupSwing = s; }
+function setSetupSwing(s)  { setupSwing = makeSetup(s); }
 
 // ══════════════════════════════════════════════════════════
 // Daily reset
@@ -136,8 +257,8 @@ function dailyReset(equity = 0) {
   dayRealizedPnlUsd = 0;
   tradesToday       = 0;
   consecutiveLosses = 0;
-  setupScalp        = { active: false };
-  setupSwing        = { active: false };
+  setupScalp        = makeSetup({ active: false });
+  setupSwing        = makeSetup({ active: false });
   log.info(`[State] Daily reset. Start equity: $${dayStartEquity.toFixed(2)}`);
 }
 
@@ -149,13 +270,15 @@ function getStats() {
     dayRealizedPnlUsd,
     tradesToday,
     consecutiveLosses,
-    openCount: openPositions.length,
+    openCount: openPositions.size,
   };
 }
 
 module.exports = {
   riskOK,
-  addPosition, adoptPosition, replacePosition, removePosition, getPositions,
+  addPosition, adoptPosition, replacePosition, removePosition, hasPosition, getPositions,
+  markTp1Done, inSafeZone,
+  EXIT, exitEvent,
   updatePnL,
   getSetupScalp, setSetupScalp,
   getSetupSwing, setSetupSwing,
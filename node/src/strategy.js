@@ -8,6 +8,7 @@
 //   onH1Close()            — run on every H1 candle close (swing)
 //   managePositions()      — run on every tick cycle
 //   reconcilePositions()   — run periodically to sync with platform
+//   warmUp()               — run once after the candle history loads
 // ==============================================================
 
 const cfg             = require('./config');
@@ -22,12 +23,63 @@ const tradesRepo      = require('./repo/tradesRepo');
 const predictionsRepo = require('./repo/predictionsRepo');
 const mlModel         = require('./mlModel');
 
-// ── Array extractors ───────────────────────────────────────────
+// ── Column accessors ───────────────────────────────────────────
+// cs.get() returns column-wise candles, so these are plain lookups.
 
-const closes = c => c.map(b => b.close);
-const highs  = c => c.map(b => b.high);
-const lows   = c => c.map(b => b.low);
-const last   = c => c[c.length - 1];
+const closes = c => c.close;
+const highs  = c => c.high;
+const lows   = c => c.low;
+const size   = c => c.time.length;
+const last   = c => cs.lastBar(c);
+
+// ── Memoised indicators (computed at most once per closed bar) ──
+
+const rsiOf = (tf, period) =>
+  cs.memo(tf, `rsi:${period}`, c => ind.rsi(closes(c), period));
+const atrRatioOf = (tf, period, smaPeriod) =>
+  cs.memo(tf, `atrRatio:${period}:${smaPeriod}`, c => ind.atrRatio(highs(c), lows(c), closes(c), period, smaPeriod));
+const emaSlopeOf = (tf, period, lookback, atrVal) =>
+  cs.memo(tf, `emaSlope:${period}:${lookback}:${atrVal}`, c => ind.emaSlope(closes(c), period, lookback, atrVal));
+
+// ── Per-bar context ────────────────────────────────────────────
+// Built once at the top of each candle-close handler from the store and the
+// registered indicator streams, then passed to the filters/setup/BOS/SLTP
+// helpers so none of them repeat the same store and indicator lookups.
+
+/**
+ * @typedef {{ tf:string, candles:object, bar:object|undefined,
+ *             bid:number, ask:number, spread:number,
+ *             atr:number|null, emaFast:number|null, emaPull:number|null }} BarContext
+ */
+
+/** @returns {BarContext} */
+function barContext(tf, bid, ask) {
+  const candles = cs.get(tf);
+  return {
+    tf,
+    candles,
+    bar:     last(candles),
+    bid,
+    ask,
+    spread:  ask - bid,
+    atr:     cs.atr(tf, cfg.ATR_PERIOD),
+    emaFast: cs.ema(tf, cfg.EMA_FAST_PERIOD),
+    emaPull: cs.ema(tf, cfg.EMA_PULLBACK_PERIOD),
+  };
+}
+
+// ── Last bar processed per handler ─────────────────────────────
+// Guards against running a candle-close handler twice for the same bar
+// (overlapping polls), which would redo the gates and log a duplicate signal.
+const _lastProcessedTs = { M5: 0, H1: 0 };
+
+/** True (and records the bar) if `tf`'s latest closed bar has not been handled yet. */
+function _isNewBar(tf) {
+  const bar = last(cs.get(tf));
+  if (!bar || bar.time === _lastProcessedTs[tf]) return false;
+  _lastProcessedTs[tf] = bar.time;
+  return true;
+}
 
 // ── Reconcile miss-count tracking ──────────────────────────────
 // Tracks how many consecutive reconcile cycles each dealId has been
@@ -96,12 +148,12 @@ async function fetchMarket() {
 
 function trendFilterM15() {
   const candles = cs.get('M15');
-  if (candles.length < cfg.EMA_TREND_PERIOD) {
-    log.debug(`[Trend] M15: insufficient bars (${candles.length}/${cfg.EMA_TREND_PERIOD}) → NONE`);
+  if (size(candles) < cfg.EMA_TREND_PERIOD) {
+    log.debug(`[Trend] M15: insufficient bars (${size(candles)}/${cfg.EMA_TREND_PERIOD}) → NONE`);
     return 'NONE';
   }
 
-  const ema200 = ind.ema(closes(candles), cfg.EMA_TREND_PERIOD);
+  const ema200 = cs.ema('M15', cfg.EMA_TREND_PERIOD);
   if (ema200 === null) {
     log.debug('[Trend] M15: EMA200 not ready → NONE');
     return 'NONE';
@@ -115,12 +167,12 @@ function trendFilterM15() {
 
 function trendFilterH4() {
   const candles = cs.get('H4');
-  if (candles.length < cfg.EMA_TREND_PERIOD) {
-    log.debug(`[Trend] H4: insufficient bars (${candles.length}/${cfg.EMA_TREND_PERIOD}) → NONE`);
+  if (size(candles) < cfg.EMA_TREND_PERIOD) {
+    log.debug(`[Trend] H4: insufficient bars (${size(candles)}/${cfg.EMA_TREND_PERIOD}) → NONE`);
     return 'NONE';
   }
 
-  const ema200 = ind.ema(closes(candles), cfg.EMA_TREND_PERIOD);
+  const ema200 = cs.ema('H4', cfg.EMA_TREND_PERIOD);
   if (ema200 === null) {
     log.debug('[Trend] H4: EMA200 not ready → NONE');
     return 'NONE';
@@ -136,16 +188,26 @@ function trendFilterH4() {
 // G) Chop filter
 // ══════════════════════════════════════════════════════════════
 
-function chopFilter(tf) {
-  const candles = cs.get(tf);
-  if (candles.length < cfg.EMA_PULLBACK_PERIOD) {
-    log.debug(`[Chop] ${tf}: insufficient bars (${candles.length}/${cfg.EMA_PULLBACK_PERIOD}) → skip`);
+/**
+ * True when the TF is too flat to trade.  The verdict depends only on the
+ * closed bars, so it is memoised per bar and any further callers on the
+ * same bar reuse it.
+ * @param {BarContext} ctx
+ */
+function chopFilter(ctx) {
+  return cs.memo(ctx.tf, 'chop', () => _computeChop(ctx));
+}
+
+function _computeChop(ctx) {
+  const { tf, candles } = ctx;
+  if (size(candles) < cfg.EMA_PULLBACK_PERIOD) {
+    log.debug(`[Chop] ${tf}: insufficient bars (${size(candles)}/${cfg.EMA_PULLBACK_PERIOD}) → skip`);
     return true;
   }
 
-  const ema20  = ind.ema(closes(candles), cfg.EMA_FAST_PERIOD);
-  const ema50  = ind.ema(closes(candles), cfg.EMA_PULLBACK_PERIOD);
-  const atrVal = ind.atr(highs(candles), lows(candles), closes(candles), cfg.ATR_PERIOD);
+  const ema20  = ctx.emaFast;
+  const ema50  = ctx.emaPull;
+  const atrVal = ctx.atr;
 
   if (ema20 === null || ema50 === null || atrVal === null) {
     log.debug(`[Chop] ${tf}: indicators not ready → skip`);
@@ -199,13 +261,13 @@ function _isRejectionCandle(bar, direction) {
  * Fix #7: Added EMA alignment check (EMA20 must be aligned with trend)
  *         and rejection candle (bar must close in the trend direction).
  */
-function createSetup(tf, trend) {
-  const candles = cs.get(tf);
-  if (candles.length < cfg.EMA_PULLBACK_PERIOD) return { active: false };
+function createSetup(ctx, trend) {
+  const { tf, candles } = ctx;
+  if (size(candles) < cfg.EMA_PULLBACK_PERIOD) return { active: false };
 
-  const ema20  = ind.ema(closes(candles), cfg.EMA_FAST_PERIOD);
-  const ema50  = ind.ema(closes(candles), cfg.EMA_PULLBACK_PERIOD);
-  const atrVal = ind.atr(highs(candles), lows(candles), closes(candles), cfg.ATR_PERIOD);
+  const ema20  = ctx.emaFast;
+  const ema50  = ctx.emaPull;
+  const atrVal = ctx.atr;
   if (ema20 === null || ema50 === null || atrVal === null) return { active: false };
 
   // Trend strength proxy: |EMA20 − EMA50| / ATR
@@ -226,7 +288,7 @@ function createSetup(tf, trend) {
   const tol20 = cfg.FAST_PULLBACK_TOL * atrVal;
   const allowFast = spreadATR >= cfg.FAST_PULLBACK_SPREADATR_MIN;
 
-  const bar = last(candles);
+  const bar = ctx.bar;
 
   if (trend === 'UP') {
     if (ema20 <= ema50) {
@@ -318,8 +380,8 @@ function createSetup(tf, trend) {
 /**
  * Update the pullback extreme to track the deepest retracement.
  */
-function updateSetupExtreme(tf, setup) {
-  const bar = last(cs.get(tf));
+function updateSetupExtreme(ctx, setup) {
+  const { tf, bar } = ctx;
   if (setup.direction === 'BUY') {
     const prev = setup.pullbackExtreme;
     setup.pullbackExtreme = Math.min(prev, bar.low);
@@ -338,9 +400,9 @@ function updateSetupExtreme(tf, setup) {
 /**
  * True if more than expiryBars closed bars have appeared since the setup was created.
  */
-function setupExpired(tf, setup, expiryBars) {
-  const candles   = cs.get(tf);
-  const barsSince = candles.filter(c => c.time > setup.createdTime).length;
+function setupExpired(ctx, setup, expiryBars) {
+  const tf        = ctx.tf;
+  const barsSince = cs.countAfter(ctx.candles, setup.createdTime);
   const expired   = barsSince > expiryBars;
   if (!expired) {
     log.debug(`[Setup] ${tf}: active ${setup.direction} setup — ${barsSince}/${expiryBars} bars elapsed`);
@@ -359,46 +421,45 @@ function setupExpired(tf, setup, expiryBars) {
  * Fix #7: Added BOS margin = max(spread, 0.05×ATR) to require a
  *         meaningful close beyond the structure level, not just a tick.
  *
- * @param {string} tf
+ * @param {BarContext} ctx  Supplies the live spread for the margin
  * @param {object} setup
  * @param {number} bosLookback
- * @param {number} spread  Current bid-ask spread (passed from caller)
  */
-function triggerBOS(tf, setup, bosLookback, spread = 0) {
-  const candles = cs.get(tf);
-  if (candles.length < bosLookback + 1) return false;
+function triggerBOS(ctx, setup, bosLookback) {
+  const { tf, candles, spread } = ctx;
+  if (size(candles) < bosLookback + 1) return false;
 
-  const atrVal = ind.atr(highs(candles), lows(candles), closes(candles), cfg.ATR_PERIOD);
+  const atrVal = ctx.atr;
   if (atrVal === null) return false;
 
-  const bar   = last(candles);
+  const bar   = ctx.bar;
   const range = bar.high - bar.low;
   if (range > cfg.BIG_CANDLE_ATR_MAX * atrVal) {
     log.debug(`[BOS] ${tf}: big candle skipped — range=${range.toFixed(4)} > max=${(cfg.BIG_CANDLE_ATR_MAX * atrVal).toFixed(4)}`);
     return false;
   }
 
-  const prevCandles = candles.slice(0, -1);
-  if (prevCandles.length < bosLookback) return false;
+  // Structure levels over the bosLookback bars before this one
+  const prior = cs.priorExtrema(tf, bosLookback);
 
   // BOS margin: require close to clear the level by at least max(spread, 5% of ATR)
   const margin = Math.max(spread, 0.05 * atrVal);
 
   if (setup.direction === 'BUY') {
-    const level     = ind.highestHigh(highs(prevCandles), bosLookback);
+    const level     = prior.max();
     const triggered = bar.close > level + margin;
     if (triggered) {
       log.info(`[BOS] BUY triggered on ${tf}: close=${bar.close.toFixed(4)} > HH=${level.toFixed(4)} + margin=${margin.toFixed(4)}`);
-    } else {
+    } else if (log.isDebug()) {
       log.debug(`[BOS] ${tf}: BUY not triggered — close=${bar.close.toFixed(4)} vs HH+margin=${(level + margin).toFixed(4)} (need +${(level + margin - bar.close).toFixed(4)} more)`);
     }
     return triggered;
   } else {
-    const level     = ind.lowestLow(lows(prevCandles), bosLookback);
+    const level     = prior.min();
     const triggered = bar.close < level - margin;
     if (triggered) {
       log.info(`[BOS] SELL triggered on ${tf}: close=${bar.close.toFixed(4)} < LL=${level.toFixed(4)} - margin=${margin.toFixed(4)}`);
-    } else {
+    } else if (log.isDebug()) {
       log.debug(`[BOS] ${tf}: SELL not triggered — close=${bar.close.toFixed(4)} vs LL-margin=${(level - margin).toFixed(4)} (need -${(bar.close - (level - margin)).toFixed(4)} more)`);
     }
     return triggered;
@@ -415,8 +476,7 @@ function triggerBOS(tf, setup, bosLookback, spread = 0) {
  * Returns true (allow) when not enough data to compute RSI.
  */
 function rsiGateM5(direction) {
-  const m5 = cs.get('M5');
-  const rsiVal = ind.rsi(closes(m5), cfg.RSI_PERIOD);
+  const rsiVal = rsiOf('M5', cfg.RSI_PERIOD);
   if (rsiVal === null) return true;
   if (direction === 'BUY'  && rsiVal < cfg.M5_RSI_BUY_MIN) {
     log.debug(`[RSI] M5 BUY blocked: RSI=${rsiVal.toFixed(1)} < ${cfg.M5_RSI_BUY_MIN}`);
@@ -436,13 +496,12 @@ function rsiGateM5(direction) {
  * Returns true (allow) when not enough data.
  */
 function atrRatioGateM5() {
-  const m5     = cs.get('M5');
-  const atrVal = ind.atr(highs(m5), lows(m5), closes(m5), cfg.ATR_PERIOD);
+  const atrVal = cs.atr('M5', cfg.ATR_PERIOD);
   if (atrVal !== null && atrVal < cfg.ATR_ABS_MIN_M5) {
     log.debug(`[ATR Ratio] M5 blocked: atr=${atrVal.toFixed(4)} < floor=${cfg.ATR_ABS_MIN_M5} — dead market`);
     return false;
   }
-  const ratio = ind.atrRatio(highs(m5), lows(m5), closes(m5), cfg.ATR_PERIOD, cfg.ATR_RATIO_SMA_PERIOD);
+  const ratio = atrRatioOf('M5', cfg.ATR_PERIOD, cfg.ATR_RATIO_SMA_PERIOD);
   if (ratio === null) return true;
   if (ratio < cfg.ATR_RATIO_MIN) {
     log.debug(`[ATR Ratio] M5 blocked: ratio=${ratio.toFixed(3)} < min=${cfg.ATR_RATIO_MIN}`);
@@ -456,11 +515,12 @@ function atrRatioGateM5() {
  * M5 BOS candle body quality gate.
  * Requires the trigger bar's body to be >= BOS_CANDLE_BODY_ATR_MIN × ATR.
  * Filters micro-wick BOS events that rarely follow through.
- * @param {number|null} atrVal  Pre-computed M5 ATR
+ * @param {BarContext} ctx  M5 context
  */
-function bosBodyGateM5(atrVal) {
+function bosBodyGateM5(ctx) {
+  const atrVal  = ctx.atr;
   if (!atrVal) return true;
-  const bar     = last(cs.get('M5'));
+  const bar     = ctx.bar;
   const body    = Math.abs(bar.close - bar.open);
   const minBody = cfg.BOS_CANDLE_BODY_ATR_MIN * atrVal;
   if (body < minBody) {
@@ -479,9 +539,9 @@ function bosBodyGateM5(atrVal) {
  */
 function m15TrendStrengthGate(trend) {
   const m15 = cs.get('M15');
-  if (m15.length < cfg.EMA_TREND_PERIOD) return true;
-  const ema200 = ind.ema(closes(m15), cfg.EMA_TREND_PERIOD);
-  const atr15  = ind.atr(highs(m15), lows(m15), closes(m15), cfg.M15_ATR_PERIOD);
+  if (size(m15) < cfg.EMA_TREND_PERIOD) return true;
+  const ema200 = cs.ema('M15', cfg.EMA_TREND_PERIOD);
+  const atr15  = cs.atr('M15', cfg.M15_ATR_PERIOD);
   if (!ema200 || !atr15) return true;
 
   const closeLast = last(m15).close;
@@ -491,7 +551,7 @@ function m15TrendStrengthGate(trend) {
     return false;
   }
 
-  const slope = ind.emaSlope(closes(m15), cfg.EMA_TREND_PERIOD, cfg.M15_EMA200_SLOPE_BARS, atr15);
+  const slope = emaSlopeOf('M15', cfg.EMA_TREND_PERIOD, cfg.M15_EMA200_SLOPE_BARS, atr15);
   if (slope !== null) {
     const slopeOk = (trend === 'UP' && slope > 0) || (trend === 'DOWN' && slope < 0);
     if (!slopeOk) {
@@ -513,9 +573,9 @@ function m15TrendStrengthGate(trend) {
  */
 function h1MacroFilter(direction) {
   const h1 = cs.get('H1');
-  if (h1.length < cfg.EMA_TREND_PERIOD) return true;
-  const ema200h1 = ind.ema(closes(h1), cfg.EMA_TREND_PERIOD);
-  const rsiH1    = ind.rsi(closes(h1), cfg.RSI_PERIOD);
+  if (size(h1) < cfg.EMA_TREND_PERIOD) return true;
+  const ema200h1 = cs.ema('H1', cfg.EMA_TREND_PERIOD);
+  const rsiH1    = rsiOf('H1', cfg.RSI_PERIOD);
   if (!ema200h1) return true;
 
   const closeH1 = last(h1).close;
@@ -546,9 +606,9 @@ function h1MacroFilter(direction) {
 // J) SL/TP computation
 // ══════════════════════════════════════════════════════════════
 
-function computeSLTP(tf, mode, setup, entryPrice) {
-  const candles = cs.get(tf);
-  const atrVal  = ind.atr(highs(candles), lows(candles), closes(candles), cfg.ATR_PERIOD);
+function computeSLTP(ctx, mode, setup, entryPrice) {
+  const tf      = ctx.tf;
+  const atrVal  = ctx.atr;
   const buffer  = cfg.SL_BUFFER_ATR * atrVal;
 
   let sl, tp1, tp2;
@@ -592,15 +652,14 @@ function computeSLTP(tf, mode, setup, entryPrice) {
 // K) Order placement
 // ══════════════════════════════════════════════════════════════
 
-async function placeOrder(mode, setup, bid, ask) {
-  const tf    = mode === 'SCALP' ? 'M5' : 'H1';
+async function placeOrder(mode, setup, ctx) {
+  const { bid, ask, spread } = ctx;
   const size  = mode === 'SCALP' ? cfg.SCALP_SIZE_UNITS : cfg.SWING_SIZE_UNITS;
   const entry = setup.direction === 'BUY' ? ask : bid;
 
-  const { sl, tp1, tp2 } = computeSLTP(tf, mode, setup, entry);
+  const { sl, tp1, tp2 } = computeSLTP(ctx, mode, setup, entry);
 
   // Fix #7: ATR/spread sanity — TP1 must be meaningful relative to the spread
-  const spread   = ask - bid;
   const tp1Dist  = Math.abs(tp1 - entry);
   if (tp1Dist < 2 * spread) {
     log.warn(
@@ -688,21 +747,26 @@ async function managePositions() {
   // We skip our API close/reopen calls — they would be rejected anyway.
   if (!tradeable) return;
 
-  for (const pos of [...positions]) {
+  // Nothing is near an SL/TP level — skip the per-position checks
+  if (state.inSafeZone(bid, ask)) return;
+
+  for (const pos of positions) {
     const exitPrice = pos.direction === 'BUY' ? bid : ask;
 
-    log.debug(
-      `[Manage] ${pos.direction} pos dealId=${pos.dealId} | ` +
-      `current=${exitPrice.toFixed(4)} entry=${pos.entry.toFixed(4)} | ` +
-      `SL=${pos.sl.toFixed(4)} TP1=${pos.tp1.toFixed(4)}${pos.tp1Done ? '(done)' : ''} TP2=${pos.tp2.toFixed(4)}`
-    );
+    // Per-tick line: skip building it entirely when DEBUG is filtered out
+    if (log.isDebug()) {
+      log.debug(
+        `[Manage] ${pos.direction} pos dealId=${pos.dealId} | ` +
+        `current=${exitPrice.toFixed(4)} entry=${pos.entry.toFixed(4)} | ` +
+        `SL=${pos.sl.toFixed(4)} TP1=${pos.tp1.toFixed(4)}${pos.tp1Done ? '(done)' : ''} TP2=${pos.tp2.toFixed(4)}`
+      );
+    }
 
-    // ── SL hit ─────────────────────────────────────────────
-    const slHit =
-      (pos.direction === 'BUY'  && exitPrice <= pos.sl) ||
-      (pos.direction === 'SELL' && exitPrice >= pos.sl);
+    const event = state.exitEvent(pos, bid, ask);
+    if (event === state.EXIT.NONE) continue;
 
-    if (slHit) {
+    // ── SL hit ─────────────────────────────────────────────
+    if (event === state.EXIT.SL) {
       log.trade(`[Manage] SL hit — ${pos.direction} dealId=${pos.dealId} exit=${exitPrice.toFixed(4)}`);
       let confirmed;
       try { confirmed = await api.closePosition(pos.dealId); } catch (e) {
@@ -722,105 +786,95 @@ async function managePositions() {
     }
 
     // ── TP1 hit ────────────────────────────────────────────
-    if (!pos.tp1Done) {
-      const tp1Hit =
-        (pos.direction === 'BUY'  && exitPrice >= pos.tp1) ||
-        (pos.direction === 'SELL' && exitPrice <= pos.tp1);
-
-      if (tp1Hit) {
-        log.trade(`[Manage] TP1 hit — ${pos.direction} dealId=${pos.dealId} exit=${exitPrice.toFixed(4)}`);
-
-        // Fix #1: when size=1 (or closeSize rounds to 0) skip partial close,
-        // just mark tp1Done and optionally move SL to breakeven.
-        const closeSize = Math.floor(pos.size * cfg.PARTIAL_CLOSE_TP1);
-
-        if (closeSize < 1) {
-          const newSL = cfg.MOVE_SL_TO_BREAKEVEN_ON_TP1 ? pos.entry : pos.sl;
-          log.trade(
-            `[Manage] TP1 hit (size=${pos.size} — no partial) — marking tp1Done` +
-            (cfg.MOVE_SL_TO_BREAKEVEN_ON_TP1 ? ', moving SL to breakeven' : '')
-          );
-          if (cfg.MOVE_SL_TO_BREAKEVEN_ON_TP1) {
-            try {
-              await api.updatePosition(pos.dealId, { stopLevel: newSL });
-              log.debug(`[Manage] SL updated to breakeven: ${newSL.toFixed(4)}`);
-            } catch (e) {
-              log.warn(`[Manage] SL BE update failed: ${e.message}`);
-            }
+    if (event === state.EXIT.TP1) {
+      log.trade(`[Manage] TP1 hit — ${pos.direction} dealId=${pos.dealId} exit=${exitPrice.toFixed(4)}`);
+
+      // Fix #1: when size=1 (or closeSize rounds to 0) skip partial close,
+      // just mark tp1Done and optionally move SL to breakeven.
+      const closeSize = Math.floor(pos.size * cfg.PARTIAL_CLOSE_TP1);
+
+      if (closeSize < 1) {
+        const newSL = cfg.MOVE_SL_TO_BREAKEVEN_ON_TP1 ? pos.entry : pos.sl;
+        log.trade(
+          `[Manage] TP1 hit (size=${pos.size} — no partial) — marking tp1Done` +
+          (cfg.MOVE_SL_TO_BREAKEVEN_ON_TP1 ? ', moving SL to breakeven' : '')
+        );
+        if (cfg.MOVE_SL_TO_BREAKEVEN_ON_TP1) {
+          try {
+            await api.updatePosition(pos.dealId, { stopLevel: newSL });
+            log.debug(`[Manage] SL updated to breakeven: ${newSL.toFixed(4)}`);
+          } catch (e) {
+            log.warn(`[Manage] SL BE update failed: ${e.message}`);
           }
-          state.replacePosition(pos.dealId, { ...pos, tp1Done: true, sl: newSL });
-          telegram.notifyTradeClosed({
-            event: 'TP1_HIT', direction: pos.direction, epic: cfg.EPIC,
-            mode: pos.mode, entry: pos.entry, exitPrice, pnl: 0, dealId: pos.dealId,
-          }).catch(() => {});
-          continue;
         }
+        state.replacePosition(pos.dealId, { ...pos, tp1Done: true, sl: newSL });
+        telegram.notifyTradeClosed({
+          event: 'TP1_HIT', direction: pos.direction, epic: cfg.EPIC,
+          mode: pos.mode, entry: pos.entry, exitPrice, pnl: 0, dealId: pos.dealId,
+        }).catch(() => {});
+        continue;
+      }
 
-        // Size >= 2: partial close + reopen remainder
-        try {
-          const confirmed    = await api.closePosition(pos.dealId);
-          const remainingSize = pos.size - closeSize;
-
-          // Fix #2: prefer broker profit, scaled to closed portion
-          const pnl1 = await resolvePnlAsync(confirmed, pos.dealId, pos.openedTime, pos.direction, pos.entry, exitPrice, closeSize);
-          // Fix #3: partial close at TP1 is rarely a loss, but use actual sign
-          state.updatePnL(pnl1, pnl1 < 0);
-          tradesRepo.closeTrade({ dealId: pos.dealId, closedTs: Date.now(), exit: exitPrice, realizedPnl: pnl1, closeReason: 'TP1_HIT' }).catch(() => {});
-          telegram.notifyTradeClosed({
-            event: 'TP1_HIT', direction: pos.direction, epic: cfg.EPIC,
-            mode: pos.mode, entry: pos.entry, exitPrice, pnl: pnl1, dealId: pos.dealId,
-          }).catch(() => {});
+      // Size >= 2: partial close + reopen remainder
+      try {
+        const confirmed    = await api.closePosition(pos.dealId);
+        const remainingSize = pos.size - closeSize;
+
+        // Fix #2: prefer broker profit, scaled to closed portion
+        const pnl1 = await resolvePnlAsync(confirmed, pos.dealId, pos.openedTime, pos.direction, pos.entry, exitPrice, closeSize);
+        // Fix #3: partial close at TP1 is rarely a loss, but use actual sign
+        state.updatePnL(pnl1, pnl1 < 0);
+        tradesRepo.closeTrade({ dealId: pos.dealId, closedTs: Date.now(), exit: exitPrice, realizedPnl: pnl1, closeReason: 'TP1_HIT' }).catch(() => {});
+        telegram.notifyTradeClosed({
+          event: 'TP1_HIT', direction: pos.direction, epic: cfg.EPIC,
+          mode: pos.mode, entry: pos.entry, exitPrice, pnl: pnl1, dealId: pos.dealId,
+        }).catch(() => {});
 
-          if (remainingSize >= 1) {
-            const newSL = cfg.MOVE_SL_TO_BREAKEVEN_ON_TP1 ? pos.entry : pos.sl;
-            log.debug(`[Manage] Reopening ${remainingSize} unit(s) | SL=${newSL.toFixed(4)}`);
-            const { dealId: newDealId, dealReference: newRef } = await api.createPosition({
-              epic:        cfg.EPIC,
-              direction:   pos.direction,
-              size:        remainingSize,
-              stopLevel:   newSL,
-              profitLevel: pos.tp2,
-            });
-            const reopenedTime = Date.now();
-            state.replacePosition(pos.dealId, {
-              ...pos,
-              dealId:        newDealId,
-              dealReference: newRef,
-              size:          remainingSize,
-              entry:         exitPrice,
-              sl:            newSL,
-              tp1Done:       true,
-              openedTime:    reopenedTime,
-            });
-            tradesRepo.insertTrade({
-              dealId:    newDealId,
-              epic:      cfg.EPIC,
-              openedTs:  reopenedTime,
-              direction: pos.direction,
-              size:      remainingSize,
-              entry:     exitPrice,
-              sl:        newSL,
-              tp2:       pos.tp2,
-              mode:      pos.mode,
-            }).catch(() => {});
-            log.trade(`[Manage] Remaining ${remainingSize} unit(s) reopened → dealId=${newDealId}`);
-          } else {
-            state.removePosition(pos.dealId);
-          }
-        } catch (e) {
-          log.error(`[Manage] TP1 partial close failed: ${e.message}`);
-          pos.tp1Done = true;
+        if (remainingSize >= 1) {
+          const newSL = cfg.MOVE_SL_TO_BREAKEVEN_ON_TP1 ? pos.entry : pos.sl;
+          log.debug(`[Manage] Reopening ${remainingSize} unit(s) | SL=${newSL.toFixed(4)}`);
+          const { dealId: newDealId, dealReference: newRef } = await api.createPosition({
+            epic:        cfg.EPIC,
+            direction:   pos.direction,
+            size:        remainingSize,
+            stopLevel:   newSL,
+            profitLevel: pos.tp2,
+          });
+          const reopenedTime = Date.now();
+          state.replacePosition(pos.dealId, {
+            ...pos,
+            dealId:        newDealId,
+            dealReference: newRef,
+            size:          remainingSize,
+            entry:         exitPrice,
+            sl:            newSL,
+            tp1Done:       true,
+            openedTime:    reopenedTime,
+          });
+          tradesRepo.insertTrade({
+            dealId:    newDealId,
+            epic:      cfg.EPIC,
+            openedTs:  reopenedTime,
+            direction: pos.direction,
+            size:      remainingSize,
+            entry:     exitPrice,
+            sl:        newSL,
+            tp2:       pos.tp2,
+            mode:      pos.mode,
+          }).catch(() => {});
+          log.trade(`[Manage] Remaining ${remainingSize} unit(s) reopened → dealId=${newDealId}`);
+        } else {
+          state.removePosition(pos.dealId);
         }
-        continue;
+      } catch (e) {
+        log.error(`[Manage] TP1 partial close failed: ${e.message}`);
+        state.markTp1Done(pos.dealId);
       }
+      continue;
     }
 
     // ── TP2 hit ────────────────────────────────────────────
-    const tp2Hit =
-      (pos.direction === 'BUY'  && exitPrice >= pos.tp2) ||
-      (pos.direction === 'SELL' && exitPrice <= pos.tp2);
-
-    if (tp2Hit) {
+    if (event === state.EXIT.TP2) {
       log.trade(`[Manage] TP2 hit — ${pos.direction} dealId=${pos.dealId} exit=${exitPrice.toFixed(4)}`);
       let confirmed;
       try { confirmed = await api.closePosition(pos.dealId); } catch (e) {
@@ -863,7 +917,7 @@ async function reconcilePositions() {
 
   // Clean up miss counters for positions no longer tracked
   for (const id of Object.keys(_reconcileMissCount)) {
-    if (!botPositions.find(p => p.dealId === id)) {
+    if (!state.hasPosition(id)) {
       delete _reconcileMissCount[id];
     }
   }
@@ -885,7 +939,7 @@ async function reconcilePositions() {
 
   const MISS_THRESHOLD = 3;
 
-  for (const pos of [...botPositions]) {
+  for (const pos of botPositions) {
     if (platformIds.has(pos.dealId)) {
       // Position is present — reset any pending miss counter
       delete _reconcileMissCount[pos.dealId];
@@ -1061,6 +1115,8 @@ async function syncExistingPositions() {
  * loaded JSON model and block the entry if confidence is too low.
  */
 async function onM5Close() {
+  if (!_isNewBar('M5')) return;
+
   // Mutable signal context — populated as we proceed through gates.
   // The finally block always flushes it to the DB.
   const sig = {
@@ -1085,10 +1141,11 @@ async function onM5Close() {
     if (!tradeable) { sig.action = 'SKIP_MARKET_CLOSED'; return; }
 
     // Pre-compute all gates so we can log a single summary line
-    const spread   = ask - bid;
+    const ctx      = barContext('M5', bid, ask);
+    const spread   = ctx.spread;
     const spreadOk = spread <= cfg.SPREAD_MAX;   // crude check used for log below
     const trend    = trendFilterM15();
-    const isChop   = chopFilter('M5');
+    const isChop   = chopFilter(ctx);
     const setup    = state.getSetupScalp();
 
     log.info(
@@ -1098,33 +1155,32 @@ async function onM5Close() {
     );
 
     // Build feature snapshot for ML training dataset
-    const m5  = cs.get('M5');
+    const m5  = ctx.candles;
     const m15 = cs.get('M15');
-    const m1  = cs.get('M1');
     const h1  = cs.get('H1');
 
-    const m5_ema20   = m5.length  >= cfg.EMA_FAST_PERIOD      ? ind.ema(closes(m5),  cfg.EMA_FAST_PERIOD)      : null;
-    const m5_ema50   = m5.length  >= cfg.EMA_PULLBACK_PERIOD   ? ind.ema(closes(m5),  cfg.EMA_PULLBACK_PERIOD)  : null;
-    const m5_atr     = m5.length  >= cfg.ATR_PERIOD            ? ind.atr(highs(m5),   lows(m5),   closes(m5),   cfg.ATR_PERIOD) : null;
-    const m5_rsi14   = ind.rsi(closes(m5), cfg.RSI_PERIOD);
+    const m5_ema20   = ctx.emaFast;
+    const m5_ema50   = ctx.emaPull;
+    const m5_atr     = ctx.atr;
+    const m5_rsi14   = rsiOf('M5', cfg.RSI_PERIOD);
     const m5_bb_width = ind.bollingerWidth(closes(m5), 20);
-    const m5_atr_ratio = ind.atrRatio(highs(m5), lows(m5), closes(m5), cfg.ATR_PERIOD, cfg.ATR_RATIO_SMA_PERIOD);
+    const m5_atr_ratio = atrRatioOf('M5', cfg.ATR_PERIOD, cfg.ATR_RATIO_SMA_PERIOD);
 
-    const m15_ema200  = m15.length >= cfg.EMA_TREND_PERIOD     ? ind.ema(closes(m15), cfg.EMA_TREND_PERIOD)     : null;
-    const m15_atr     = m15.length >= cfg.M15_ATR_PERIOD       ? ind.atr(highs(m15),  lows(m15),  closes(m15),  cfg.M15_ATR_PERIOD) : null;
+    const m15_ema200  = cs.ema('M15', cfg.EMA_TREND_PERIOD);
+    const m15_atr     = cs.atr('M15', cfg.M15_ATR_PERIOD);
     const m15_ema200_slope = m15_atr
-      ? ind.emaSlope(closes(m15), cfg.EMA_TREND_PERIOD, cfg.M15_EMA200_SLOPE_BARS, m15_atr)
+      ? emaSlopeOf('M15', cfg.EMA_TREND_PERIOD, cfg.M15_EMA200_SLOPE_BARS, m15_atr)
       : null;
 
-    const m1_ema20   = m1.length  >= cfg.MICRO_EMA_FAST_PERIOD ? ind.ema(closes(m1),  cfg.MICRO_EMA_FAST_PERIOD) : null;
-    const m1_ema50   = m1.length  >= cfg.MICRO_EMA_SLOW_PERIOD ? ind.ema(closes(m1),  cfg.MICRO_EMA_SLOW_PERIOD) : null;
+    const m1_ema20   = cs.ema('M1', cfg.MICRO_EMA_FAST_PERIOD);
+    const m1_ema50   = cs.ema('M1', cfg.MICRO_EMA_SLOW_PERIOD);
 
-    const h1_ema200  = h1.length  >= cfg.EMA_TREND_PERIOD      ? ind.ema(closes(h1),  cfg.EMA_TREND_PERIOD)     : null;
-    const h1_rsi14   = ind.rsi(closes(h1), cfg.RSI_PERIOD);
+    const h1_ema200  = cs.ema('H1', cfg.EMA_TREND_PERIOD);
+    const h1_rsi14   = rsiOf('H1', cfg.RSI_PERIOD);
 
-    const m5_close  = m5.length  ? last(m5).close  : null;
-    const m15_close = m15.length ? last(m15).close : null;
-    const h1_close  = h1.length  ? last(h1).close  : null;
+    const m5_close  = ctx.bar   ? ctx.bar.close   : null;
+    const m15_close = size(m15) ? last(m15).close : null;
+    const h1_close  = size(h1)  ? last(h1).close  : null;
 
     sig.features = {
       spread,
@@ -1229,13 +1285,13 @@ async function onM5Close() {
         }
       }
 
-      if (setupExpired('M5', setup, cfg.SETUP_EXPIRY_BARS_SCALP)) {
+      if (setupExpired(ctx, setup, cfg.SETUP_EXPIRY_BARS_SCALP)) {
         log.info('[M5] Setup expired — resetting');
         state.setSetupScalp({ active: false });
         sig.action = 'SKIP_EXPIRED'; return;
       }
 
-      updateSetupExtreme('M5', setup);
+      updateSetupExtreme(ctx, setup);
 
       // H1 macro alignment + M15 trend strength/slope — re-checked each bar
       const h1MacroOk = h1MacroFilter(setup.direction);
@@ -1254,7 +1310,7 @@ async function onM5Close() {
         sig.action = `${setup.direction}_SKIP_M15_STRENGTH`; return;
       }
 
-      const bosOk = triggerBOS('M5', setup, cfg.BOS_LOOKBACK_SCALP, spread);
+      const bosOk = triggerBOS(ctx, setup, cfg.BOS_LOOKBACK_SCALP);
       sig.reasons.bosTriggered = bosOk;
       // Default: setup active but BOS not yet triggered → watching
       sig.action = setup.direction === 'BUY' ? 'BUY_WATCHING' : 'SELL_WATCHING';
@@ -1276,7 +1332,7 @@ async function onM5Close() {
         // Set candidate features immediately on BOS trigger so that the
         // challenger fallback notification fires even if a post-BOS gate blocks.
         const candEntry = setup.direction === 'BUY' ? ask : bid;
-        const { sl: candSL, tp1: candTP1, tp2: candTP2 } = computeSLTP('M5', 'SCALP', setup, candEntry);
+        const { sl: candSL, tp1: candTP1, tp2: candTP2 } = computeSLTP(ctx, 'SCALP', setup, candEntry);
         sig.features.candidate_direction = setup.direction;
         sig.features.candidate_entry     = candEntry;
         sig.features.candidate_sl        = candSL;
@@ -1301,7 +1357,7 @@ async function onM5Close() {
           sig.action = `${setup.direction}_SKIP_ATR_RATIO`; return;
         }
 
-        const bodyOk = bosBodyGateM5(m5_atr);
+        const bodyOk = bosBodyGateM5(ctx);
         sig.reasons.bodyOk = bodyOk;
         if (!bodyOk) {
           log.info(`[M5] BOS candle body gate BLOCKED ${setup.direction}`);
@@ -1355,11 +1411,11 @@ async function onM5Close() {
         }
 
         sig.action = `${setup.direction}_EXEC`;
-        await placeOrder('SCALP', setup, bid, ask);
+        await placeOrder('SCALP', setup, ctx);
         state.setSetupScalp({ active: false });
       }
     } else {
-      state.setSetupScalp(createSetup('M5', trend));
+      state.setSetupScalp(createSetup(ctx, trend));
       sig.action = 'SETUP_FORMING';
     }
 
@@ -1419,6 +1475,7 @@ async function onM5Close() {
  */
 async function onH1Close() {
   if (!cfg.swingEnabled) return;
+  if (!_isNewBar('H1')) return;
   if (!state.riskOK()) return;
 
   let bid, ask, tradeable;
@@ -1428,10 +1485,11 @@ async function onH1Close() {
   if (!tradeable) return;
 
   // Pre-compute all gates so we can log a single summary line
-  const spread   = ask - bid;
+  const ctx      = barContext('H1', bid, ask);
+  const spread   = ctx.spread;
   const spreadOk = spread <= cfg.SPREAD_MAX;
   const trend    = trendFilterH4();
-  const isChop   = chopFilter('H1');
+  const isChop   = chopFilter(ctx);
   const setup    = state.getSetupSwing();
 
   log.info(
@@ -1464,21 +1522,21 @@ async function onH1Close() {
       return;
     }
 
-    if (setupExpired('H1', setup, cfg.SETUP_EXPIRY_BARS_SWING)) {
+    if (setupExpired(ctx, setup, cfg.SETUP_EXPIRY_BARS_SWING)) {
       log.info('[H1] Swing setup expired — resetting');
       state.setSetupSwing({ active: false });
       return;
     }
 
-    updateSetupExtreme('H1', setup);
+    updateSetupExtreme(ctx, setup);
 
-    // Pass spread so BOS margin check uses live spread (Fix #7)
-    if (triggerBOS('H1', setup, cfg.BOS_LOOKBACK_SWING, ask - bid)) {
-      await placeOrder('SWING', setup, bid, ask);
+    // ctx carries the live spread for the BOS margin check (Fix #7)
+    if (triggerBOS(ctx, setup, cfg.BOS_LOOKBACK_SWING)) {
+      await placeOrder('SWING', setup, ctx);
       state.setSetupSwing({ active: false });
     }
   } else {
-    state.setSetupSwing(createSetup('H1', trend));
+    state.setSetupSwing(createSetup(ctx, trend));
   }
 }
 
@@ -1499,13 +1557,13 @@ function microConfirmM1(direction) {
   if (!cfg.MICRO_CONFIRM_ENABLED) return true;
 
   const candles = cs.get('M1');
-  if (candles.length < cfg.MICRO_EMA_SLOW_PERIOD) {
-    log.debug(`[M1] Insufficient bars for micro-confirm (${candles.length}/${cfg.MICRO_EMA_SLOW_PERIOD}) — blocking`);
+  if (size(candles) < cfg.MICRO_EMA_SLOW_PERIOD) {
+    log.debug(`[M1] Insufficient bars for micro-confirm (${size(candles)}/${cfg.MICRO_EMA_SLOW_PERIOD}) — blocking`);
     return false;
   }
 
-  const ema20 = ind.ema(closes(candles), cfg.MICRO_EMA_FAST_PERIOD);
-  const ema50 = ind.ema(closes(candles), cfg.MICRO_EMA_SLOW_PERIOD);
+  const ema20 = cs.ema('M1', cfg.MICRO_EMA_FAST_PERIOD);
+  const ema50 = cs.ema('M1', cfg.MICRO_EMA_SLOW_PERIOD);
   if (ema20 === null || ema50 === null) return false;
 
   const close = last(candles).close;
@@ -1527,7 +1585,34 @@ function microConfirmM1(direction) {
   }
 }
 
+// ══════════════════════════════════════════════════════════════
+// Startup warm-up
+// ══════════════════════════════════════════════════════════════
+
+/**
+ * Register every incremental indicator the strategy reads (EMA/ATR state and
+ * BOS structure windows) with the candle store.  They are seeded straight
+ * after the history load and advanced on each appended bar from then on, so
+ * neither the first candle close nor later reads pay a catch-up pass.
+ */
+function warmUp() {
+  cs.register('M1',  { ema: [cfg.MICRO_EMA_FAST_PERIOD, cfg.MICRO_EMA_SLOW_PERIOD] });
+  cs.register('M5',  {
+    ema:     [cfg.EMA_FAST_PERIOD, cfg.EMA_PULLBACK_PERIOD],
+    atr:     [cfg.ATR_PERIOD],
+    extrema: [cfg.BOS_LOOKBACK_SCALP],
+  });
+  cs.register('M15', { ema: [cfg.EMA_TREND_PERIOD], atr: [cfg.M15_ATR_PERIOD] });
+  cs.register('H1',  {
+    ema:     [cfg.EMA_FAST_PERIOD, cfg.EMA_PULLBACK_PERIOD, cfg.EMA_TREND_PERIOD],
+    atr:     [cfg.ATR_PERIOD],
+    extrema: [cfg.BOS_LOOKBACK_SWING],
+  });
+  cs.register('H4',  { ema: [cfg.EMA_TREND_PERIOD] });
+}
+
 module.exports = {
+  warmUp,
   onM5Close,
   onH1Close,
   managePositions,
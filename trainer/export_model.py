@@ -59,7 +59,10 @@ def main():
         print(f'  features: {len(model["feature_names"])}')
         print()
         print('Weights:')
-        for name, w in model['weights'].items():
+        weights = model['weights']
+        if isinstance(weights, list):  # positional, aligned with feature_names
+            weights = dict(zip(model['feature_names'], weights))
+        for name, w in weights.items():
             print(f'  {name:35s} {w:+.6f}')
 
 
@@ -29,20 +29,24 @@ Run nightly after trading hours:
 Requirements: set DB_URL in .env (or environment).
 """
 
-import json
+import multiprocessing
 import os
 import sys
-from bisect import bisect_right
+from collections.abc import Iterator
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
 
+import numpy as np
+import orjson
 import pandas as pd
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 
 # ── Config ────────────────────────────────────────────────────
-HORIZON_BARS   = 6        # look N M5 bars ahead for both label types
-HORIZON_TF     = 'M5'
-RET_THRESHOLD  = 0.5      # |ret_norm| threshold for +1/-1 (strategy 2)
-ATR_PERIOD     = 14
+HORIZON_BARS    = 6        # look N M5 bars ahead for both label types
+HORIZON_TF      = 'M5'
+RET_THRESHOLD   = 0.5      # |ret_norm| threshold for +1/-1 (strategy 2)
+ATR_PERIOD      = 14
+CANDLE_CHUNK    = 50_000   # rows fetched per round-trip when streaming candles
 
 # ── Setup ─────────────────────────────────────────────────────
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
@@ -50,192 +54,315 @@ DB_URL = os.environ.get('DB_URL', '')
 if not DB_URL:
     sys.exit('DB_URL not set')
 
+# Processes labelling epics in parallel (only used when >1 epic is pending)
+LABEL_WORKERS = int(os.environ.get('LABEL_WORKERS') or os.cpu_count() or 1)
+
 engine = create_engine(DB_URL)
 
+# All labels go out in one INSERT: each column is sent as a single array
+# parameter and unpacked server-side by unnest(), so nothing is bound per
+# row.  NaN marks a missing future_return / ret_norm and is stored as NULL.
+INSERT_LABELS = text("""
+    INSERT INTO labels
+        (signal_id, horizon_bars, horizon_tf, label, future_return, ret_norm)
+    SELECT u.signal_id, :horizon_bars, :horizon_tf, u.label,
+           NULLIF(u.future_return, 'NaN'), NULLIF(u.ret_norm, 'NaN')
+    FROM unnest(CAST(:signal_id     AS bigint[]),
+                CAST(:label         AS smallint[]),
+                CAST(:future_return AS float8[]),
+                CAST(:ret_norm      AS float8[]))
+         AS u(signal_id, label, future_return, ret_norm)
+    ON CONFLICT (signal_id) DO NOTHING
+""")
+
+
+def _candle_arrays(blocks: list) -> tuple:
+    """(ts, high, low, close) arrays from float64 blocks of [ts, high, low, close] rows."""
+    cols = np.concatenate(blocks) if blocks else np.empty((0, 4))
+    # ms timestamps are well inside float64's exact-integer range
+    return (cols[:, 0].astype(np.int64), np.ascontiguousarray(cols[:, 1]),
+            np.ascontiguousarray(cols[:, 2]), np.ascontiguousarray(cols[:, 3]))
+
+
+def _split_by_epic(partitions) -> Iterator[tuple]:
+    """
+    Regroup streamed (epic, ts, high, low, close) rows, ordered by epic, into
+    one (epic, ts, high, low, close) array tuple per epic.  Each epic is
+    yielded as soon as its last row has arrived.
+    """
+    epic, blocks = None, []
+    for part in partitions:
+        epics = [r[0] for r in part]
+        nums  = np.array([r[1:] for r in part], dtype=np.float64).reshape(-1, 4)
+        start = 0
+        for i in range(1, len(epics) + 1):
+            if i < len(epics) and epics[i] == epics[start]:
+                continue
+            if epics[start] != epic:
+                if blocks:
+                    yield (epic, *_candle_arrays(blocks))
+                epic, blocks = epics[start], []
+            blocks.append(nums[start:i])
+            start = i
+    if blocks:
+        yield (epic, *_candle_arrays(blocks))
+
+
+def _stream_candles(conn, windows: list) -> Iterator[tuple]:
+    """
+    Fetch the M5 candles for every epic's (epic, min_ts, max_ts) window in
+    a single query, yielding (epic, ts, high, low, close) arrays per epic.
+
+    Rows come through a server-side cursor CANDLE_CHUNK at a time and each
+    chunk is converted straight to float64 blocks, so no DataFrame or full
+    set of Python row objects is ever built.
+    """
+    epics, lo, hi = (list(col) for col in zip(*windows))
+    result = conn.execution_options(yield_per=CANDLE_CHUNK).execute(text("""
+        SELECT c.epic, c.ts, c.high, c.low, c.close
+        FROM candles c
+        JOIN unnest(CAST(:epics AS text[]), CAST(:lo AS bigint[]), CAST(:hi AS bigint[]))
+             AS w(epic, lo, hi)
+          ON c.epic = w.epic AND c.ts BETWEEN w.lo AND w.hi
+        WHERE c.tf = :tf
+        ORDER BY c.epic, c.ts
+    """), {'epics': epics, 'lo': lo, 'hi': hi, 'tf': HORIZON_TF})
+    yield from _split_by_epic(result.partitions())
+
 
 def _parse_features(raw) -> dict:
     """Return features as a plain dict regardless of DB storage type."""
     if isinstance(raw, dict):
         return raw
     try:
-        return json.loads(raw)
+        return orjson.loads(raw)
     except Exception:  # pylint: disable=broad-exception-caught
         return {}
 
 
-def _at_or_before(ts_sorted: list, sig_ts: int) -> int | None:
+def _feature_table(raw_features) -> pd.DataFrame:
+    """Signal features normalised into one column per key (NaN where absent)."""
+    return pd.json_normalize([_parse_features(f) for f in raw_features])
+
+
+def _feature_array(feat_df: pd.DataFrame, key: str) -> np.ndarray:
+    """feat_df[key] as a float array; NaN where the key is missing."""
+    if key not in feat_df:
+        return np.full(len(feat_df), np.nan)
+    return np.asarray(pd.to_numeric(feat_df[key], errors='coerce'), dtype=np.float64)
+
+
+def _at_or_before(ts_arr: np.ndarray, sig_ts: np.ndarray) -> np.ndarray:
     """
-    Return the index of the last timestamp in ts_sorted that is <= sig_ts.
-    Returns None when all timestamps are after sig_ts.
+    For each signal timestamp, the index of the last candle with ts <= sig_ts.
+    -1 where every candle is after the signal.
     """
-    pos = bisect_right(ts_sorted, sig_ts) - 1
-    return pos if pos >= 0 else None
+    return np.searchsorted(ts_arr, sig_ts, side='right') - 1
 
 
-def _label_candidate(sig_ts: int, features: dict,
-                      candles_df: pd.DataFrame, ts_sorted: list) -> tuple:
+def _label_candidates(base_pos: np.ndarray, is_buy: np.ndarray, sl: np.ndarray,  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+                      tp1: np.ndarray, high_arr: np.ndarray, low_arr: np.ndarray) -> np.ndarray:
     """
-    TP1-before-SL label for a BOS candidate signal.
-    Returns (label, future_return=None, ret_norm=None).
+    TP1-before-SL labels for BOS candidate signals that carry both levels.
+    Scans the HORIZON_BARS candles after each base candle in one
+    (signals × horizon) gather; returns the label array.
     """
-    direction = features.get('candidate_direction')
-    sl        = features.get('candidate_sl')
-    tp1       = features.get('candidate_tp1')
-
-    if direction is None or sl is None or tp1 is None:
-        return 0, None, None
-
-    sl  = float(sl)
-    tp1 = float(tp1)
-
-    base_pos = _at_or_before(ts_sorted, sig_ts)
-    if base_pos is None:
-        return 0, None, None
-
-    # Scan the next HORIZON_BARS candles
-    label = 0
-    for i in range(base_pos + 1, min(base_pos + 1 + HORIZON_BARS, len(ts_sorted))):
-        ts   = ts_sorted[i]
-        high = float(candles_df.at[ts, 'high'])   # type: ignore[arg-type]
-        low  = float(candles_df.at[ts, 'low'])    # type: ignore[arg-type]
-
-        if direction == 'BUY':
-            sl_hit  = low  <= sl
-            tp1_hit = high >= tp1
-        else:  # SELL
-            sl_hit  = high >= sl
-            tp1_hit = low  <= tp1
-
-        if tp1_hit and not sl_hit:
-            label = 1
-            break
-        if sl_hit:
-            # Covers both "SL only" and "both on same candle" (conservative)
-            label = -1
-            break
-
-    return label, None, None
-
-
-def _label_future_return(sig_ts: int, features: dict,
-                          candles_df: pd.DataFrame, ts_sorted: list) -> tuple:
+    n_sig = len(base_pos)
+    ok    = base_pos >= 0
+
+    idx   = base_pos[:, None] + 1 + np.arange(HORIZON_BARS)
+    valid = (idx < len(high_arr)) & ok[:, None]
+    idx   = np.clip(idx, 0, len(high_arr) - 1)
+    high  = high_arr[idx]
+    low   = low_arr[idx]
+
+    sl_c, tp1_c, buy_c = sl[:, None], tp1[:, None], is_buy[:, None]
+    sl_hit  = np.where(buy_c, low <= sl_c,   high >= sl_c)  & valid
+    tp1_hit = np.where(buy_c, high >= tp1_c, low <= tp1_c)  & valid
+
+    # First bar where either level is touched decides the label;
+    # SL on that bar wins ties (conservative).
+    hit   = sl_hit | tp1_hit
+    first = hit.argmax(axis=1)
+    label = np.where(sl_hit[np.arange(n_sig), first], -1, 1)
+    return np.where(hit.any(axis=1), label, 0)
+
+
+def _label_future_returns(base_pos: np.ndarray, base_atr: np.ndarray,
+                          close_arr: np.ndarray) -> tuple:
     """
-    Standard future-return label.
-    Returns (label, future_return, ret_norm).
+    Standard future-return labels.
+    Returns (label, future_return, ret_norm); the last two are NaN where
+    there is no base candle, not enough future bars yet, or no stored ATR.
     """
-    base_pos = _at_or_before(ts_sorted, sig_ts)
-    if base_pos is None:
-        return 0, None, None
-
     future_pos = base_pos + HORIZON_BARS
-    if future_pos >= len(ts_sorted):
-        return 0, None, None   # not enough future bars yet
+    ok         = (base_pos >= 0) & (future_pos < len(close_arr)) & (base_atr > 0)
 
-    base_ts   = ts_sorted[base_pos]
-    future_ts = ts_sorted[future_pos]
+    base_close   = close_arr[np.where(ok, base_pos, 0)]
+    future_close = close_arr[np.where(ok, future_pos, 0)]
 
-    base_close   = float(candles_df.at[base_ts,   'close'])  # type: ignore[arg-type]
-    future_close = float(candles_df.at[future_ts, 'close'])  # type: ignore[arg-type]
+    future_return = np.where(ok, future_close - base_close, np.nan)
+    ret_norm      = np.where(ok, future_return / np.where(ok, base_atr, 1.0), np.nan)
 
-    # Use the ATR that Node.js stored in features (guaranteed to match training)
-    base_atr = features.get('m5_atr')
-    if not base_atr or base_atr <= 0:
-        return 0, None, None   # cannot compute normalised return without ATR
+    label = np.zeros(len(base_pos), dtype=np.int64)
+    label[ret_norm >= RET_THRESHOLD]  = 1
+    label[ret_norm <= -RET_THRESHOLD] = -1
+    return label, future_return, ret_norm
 
-    future_return = future_close - base_close
-    ret_norm      = future_return / base_atr
 
-    label = 0
-    if ret_norm >= RET_THRESHOLD:
-        label = 1
-    elif ret_norm <= -RET_THRESHOLD:
-        label = -1
+def _label_epic(sig_ts: np.ndarray, raw_features: list, ts_arr: np.ndarray,  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+                high_arr: np.ndarray, low_arr: np.ndarray, close_arr: np.ndarray) -> tuple:
+    """
+    Label one epic's signals against its candle arrays.
+    Returns (label, future_return, ret_norm, n_candidates).  Needs nothing
+    but its arguments, so it runs in a worker process.
+    """
+    feat_df  = _feature_table(raw_features)
+    base_pos = _at_or_before(ts_arr, sig_ts)
+    n_sig    = len(sig_ts)
+
+    # Choose label strategy based on whether candidate params exist
+    direction = (feat_df['candidate_direction'] if 'candidate_direction' in feat_df
+                 else pd.Series(None, index=feat_df.index, dtype=object))
+    is_cand = (direction.notna() & (direction != '')).to_numpy()
+    is_buy  = (direction == 'BUY').to_numpy()
+
+    # Three partitions: candidates with SL and TP1 are scanned, other
+    # signals get a future-return label, and candidates missing either
+    # level are labelled 0 without being scanned at all.
+    sl      = _feature_array(feat_df, 'candidate_sl')
+    tp1     = _feature_array(feat_df, 'candidate_tp1')
+    cand_ok = is_cand & ~np.isnan(sl) & ~np.isnan(tp1)
+    is_ret  = ~is_cand
+
+    labels   = np.zeros(n_sig, dtype=np.int64)
+    fut_ret  = np.full(n_sig, np.nan)
+    ret_norm = np.full(n_sig, np.nan)
+
+    labels[cand_ok] = _label_candidates(base_pos[cand_ok], is_buy[cand_ok],
+                                        sl[cand_ok], tp1[cand_ok], high_arr, low_arr)
+    # Use the ATR that Node.js stored in features (guaranteed to match training)
+    base_atr = _feature_array(feat_df, 'm5_atr')
+    labels[is_ret], fut_ret[is_ret], ret_norm[is_ret] = _label_future_returns(
+        base_pos[is_ret], base_atr[is_ret], close_arr)
 
-    return label, future_return, ret_norm
+    return labels, fut_ret, ret_norm, int(is_cand.sum())
 
 
 def main():  # pylint: disable=too-many-locals
     """Label all unlabelled SCALP signals using the appropriate strategy."""
     with engine.connect() as conn:
-        signals_df = pd.read_sql(text("""
-            SELECT s.id, s.epic, s.ts, s.features, s.action
+        # Per-epic backlog summary first; each epic's signals are then read
+        # on their own so only one epic's rows are in memory at a time.
+        backlog = conn.execute(text("""
+            SELECT s.epic, COUNT(*) AS n, MIN(s.ts) AS min_ts, MAX(s.ts) AS max_ts
             FROM signals s
             LEFT JOIN labels l ON l.signal_id = s.id
             WHERE l.signal_id IS NULL
               AND s.mode = 'SCALP'
-            ORDER BY s.ts
-        """), conn)
+            GROUP BY s.epic
+            ORDER BY s.epic
+        """)).all()
 
-        if signals_df.empty:
+        if not backlog:
             print('No unlabelled signals found.')
             return
 
-        print(f'Labelling {len(signals_df)} signals...')
-
-        for epic, grp in signals_df.groupby('epic'):
-            min_ts = int(grp['ts'].min()) - ATR_PERIOD * 5 * 60_000  # type: ignore[arg-type]
-            # Fetch candles far enough ahead for the last signal's horizon
-            max_ts = int(grp['ts'].max()) + (HORIZON_BARS + 2) * 5 * 60_000  # type: ignore[arg-type]
-
-            candles_df = pd.read_sql(text("""
-                SELECT ts, open, high, low, close
-                FROM candles
-                WHERE epic = :epic AND tf = :tf
-                  AND ts >= :min_ts AND ts <= :max_ts
-                ORDER BY ts
-            """), conn, params={'epic': epic, 'tf': HORIZON_TF,
-                                'min_ts': min_ts, 'max_ts': max_ts})
-
-            if candles_df.empty:
-                print(f'  {epic}: no M5 candles found, skipping')
-                continue
-
-            candles_df.set_index('ts', inplace=True)
-            ts_sorted = candles_df.index.tolist()   # ascending, sorted
-
-            rows_to_insert = []
-            n_cand = 0
-            for _, sig in grp.iterrows():
-                sig_ts      = int(sig['ts'])  # type: ignore[arg-type]
-                features    = _parse_features(sig['features'])
-                is_candidate = bool(features.get('candidate_direction'))
-
-                # Choose label strategy based on whether candidate params exist
-                if is_candidate:
-                    n_cand += 1
-                    label, fut_ret, ret_norm = _label_candidate(
-                        sig_ts, features, candles_df, ts_sorted)
-                else:
-                    label, fut_ret, ret_norm = _label_future_return(
-                        sig_ts, features, candles_df, ts_sorted)
-
-                rows_to_insert.append({
-                    'signal_id':     int(sig['id']),  # type: ignore[arg-type]
-                    'horizon_bars':  HORIZON_BARS,
-                    'horizon_tf':    HORIZON_TF,
-                    'label':         label,
-                    'future_return': fut_ret,
-                    'ret_norm':      ret_norm,
-                })
-
-            if rows_to_insert:
-                conn.execute(text("""
-                    INSERT INTO labels
-                        (signal_id, horizon_bars, horizon_tf, label, future_return, ret_norm)
-                    VALUES
-                        (:signal_id, :horizon_bars, :horizon_tf, :label, :future_return, :ret_norm)
-                    ON CONFLICT (signal_id) DO NOTHING
-                """), rows_to_insert)
-                conn.commit()
-
-                n_ret = len(rows_to_insert) - n_cand
-                print(
-                    f'  {epic}: labelled {len(rows_to_insert)} signals '
-                    f'(+1={sum(r["label"]==1 for r in rows_to_insert)}, '
-                    f'0={sum(r["label"]==0 for r in rows_to_insert)}, '
-                    f'-1={sum(r["label"]==-1 for r in rows_to_insert)}) '
-                    f'[candidate={n_cand}, return={n_ret}]'
-                )
+        print(f'Labelling {sum(row.n for row in backlog)} signals...')
+
+        # Candle window per epic: ATR warm-up before the first signal, and far
+        # enough ahead for the last signal's horizon.  All windows are fetched
+        # with one query and streamed back epic by epic.
+        windows = [
+            (row.epic,
+             int(row.min_ts) - ATR_PERIOD * 5 * 60_000,
+             int(row.max_ts) + (HORIZON_BARS + 2) * 5 * 60_000)
+            for row in backlog
+        ]
+
+        # All epics are written in one statement, committed once at the end;
+        # each list collects one array per epic for its column.
+        cols = {'signal_id': [], 'label': [], 'future_return': [], 'ret_norm': []}
+        seen = set()
+
+        def collect(epic, sig_ids, result):
+            labels, fut_ret, ret_norm, n_cand = result
+
+            cols['signal_id'].append(sig_ids)
+            cols['label'].append(labels)
+            cols['future_return'].append(fut_ret)
+            cols['ret_norm'].append(ret_norm)
+
+            n_ret = len(sig_ids) - n_cand
+            print(
+                f'  {epic}: labelled {len(sig_ids)} signals '
+                f'(+1={int((labels == 1).sum())}, '
+                f'0={int((labels == 0).sum())}, '
+                f'-1={int((labels == -1).sum())}) '
+                f'[candidate={n_cand}, return={n_ret}]'
+            )
+
+        # With several epics pending, they are labelled in worker processes
+        # while the next epic's rows are still being fetched.  Spawned (not
+        # forked) workers never inherit the open DB connection.  At most
+        # `n_workers` epics are in flight, so memory stays bounded by that
+        # many epics' arrays.  A single epic is labelled in-process.
+        n_workers = min(LABEL_WORKERS, len(backlog))
+        pool = (ProcessPoolExecutor(max_workers=n_workers,
+                                    mp_context=multiprocessing.get_context('spawn'))
+                if n_workers > 1 else None)
+        pending = {}
+
+        def drain(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            for job in done:
+                epic, sig_ids = pending.pop(job)
+                collect(epic, sig_ids, job.result())
+
+        try:
+            # Candle arrays arrive ts-ascending, one epic at a time
+            for epic, ts_arr, high_arr, low_arr, close_arr in _stream_candles(conn, windows):
+                seen.add(epic)
+                grp = pd.read_sql(text("""
+                    SELECT s.id, s.ts, s.features
+                    FROM signals s
+                    LEFT JOIN labels l ON l.signal_id = s.id
+                    WHERE l.signal_id IS NULL
+                      AND s.mode = 'SCALP'
+                      AND s.epic = :epic
+                    ORDER BY s.ts
+                """), conn, params={'epic': epic})
+                if grp.empty:
+                    continue
+
+                sig_ids = grp['id'].to_numpy(dtype=np.int64)
+                args = (grp['ts'].to_numpy(dtype=np.int64), grp['features'].tolist(),
+                        ts_arr, high_arr, low_arr, close_arr)
+                if pool is None:
+                    collect(epic, sig_ids, _label_epic(*args))
+                    continue
+
+                if len(pending) >= n_workers:
+                    drain(FIRST_COMPLETED)
+                pending[pool.submit(_label_epic, *args)] = (epic, sig_ids)
+
+            if pending:
+                drain(ALL_COMPLETED)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        for row in backlog:
+            if row.epic not in seen:
+                print(f'  {row.epic}: no M5 candles found, skipping')
+
+        if cols['signal_id']:
+            params = {k: np.concatenate(v).tolist() for k, v in cols.items()}
+            conn.execute(INSERT_LABELS, {**params,
+                                         'horizon_bars': HORIZON_BARS,
+                                         'horizon_tf':   HORIZON_TF})
+            conn.commit()
+            print(f'Committed {len(params["signal_id"])} labels.')
 
 
 if __name__ == '__main__':
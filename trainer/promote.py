@@ -21,13 +21,14 @@ Or chain in cron:
 Requires: DB_URL in .env, models/challenger.json written by train.py.
 """
 
-import json
 import os
 import shutil
 import sys
 from datetime import datetime, timezone, timedelta
+from typing import cast
 
 import numpy as np
+import orjson
 import pandas as pd
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
@@ -55,54 +56,106 @@ engine = create_engine(DB_URL)
 
 # ── Model inference (mirrors mlModel.js — pure dot product + sigmoid) ──
 
-def _sigmoid(x: float) -> float:
-    return 1.0 / (1.0 + np.exp(-x))
-
-
 def _load_model(path: str) -> dict | None:
     if not os.path.exists(path):
         return None
     try:
-        m = json.loads(open(path, encoding='utf-8').read())
+        with open(path, 'rb') as f:
+            m = orjson.loads(f.read())
         if 'weights' not in m or 'feature_names' not in m:
             raise ValueError('Invalid model format')
+        # Current exports store weights positionally (aligned with
+        # feature_names); older ones as a name → weight dict.
+        if isinstance(m['weights'], list):
+            m['weights'] = dict(zip(m['feature_names'], m['weights']))
+        # Weight vector built once per load; scoring is then a plain dot product
+        m['_names'] = list(m['weights'])
+        m['_w']     = np.fromiter(m['weights'].values(), dtype=np.float64,
+                                  count=len(m['_names']))
         return m
     except Exception as e:  # pylint: disable=broad-exception-caught
         print(f'  Could not load {os.path.basename(path)}: {e}')
         return None
 
 
-def _score_model(model: dict, features: dict) -> float:
-    logit = model.get('bias', 0.0)
-    for name, w in model['weights'].items():
-        v = features.get(name)
-        if v is None:
-            continue
-        try:
-            fv = float(v)
-            if np.isfinite(fv):
-                logit += w * fv
-        except (TypeError, ValueError):
-            pass
-    return _sigmoid(logit)
+def _feature_frame(raw_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Numeric feature table (one column per feature name seen), built once and
+    shared by every model scored against it.  Missing, non-numeric and
+    non-finite values become 0.0 so they contribute nothing, as in mlModel.js.
+    """
+    df = cast(pd.DataFrame, raw_df.apply(lambda s: pd.to_numeric(s, errors='coerce')))
+    df = df.astype(np.float64)
+    return df.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+
+
+def _score_matrix(model: dict, ev: dict) -> np.ndarray:
+    """
+    P(price UP) for every row of the eval set, as X @ w + bias.  Features in
+    ev['shared_names'] are already summed into ev['shared_logit'] (see
+    _share_weights), so only the model's remaining weights are multiplied.
+    """
+    shared = ev['shared_names']
+    keep   = [i for i, n in enumerate(model['_names']) if n not in shared]
+    names  = [model['_names'][i] for i in keep]
+    X      = ev['feat_df'].reindex(columns=names, fill_value=0.0).to_numpy(dtype=np.float64)
+    logits = X @ model['_w'][keep] + model.get('bias', 0.0) + ev['shared_logit']
+    return 1.0 / (1.0 + np.exp(-logits))
 
 
 # ── Evaluation helpers ─────────────────────────────────────────
 
-def _direction_adjusted_label(label: int, feats: dict) -> int:
+def _max_run(mask: np.ndarray) -> int:
+    """Length of the longest run of True values in a boolean array."""
+    edges  = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends   = np.flatnonzero(edges == -1)
+    return int((ends - starts).max()) if len(starts) else 0
+
+
+def _prepare_eval(signals_df: pd.DataFrame) -> dict:
+    """
+    Model-independent evaluation inputs, built once and reused for both the
+    challenger and the champion: the feature table, the SELL mask and labels
+    in the model's coordinate system (price-UP = +1).
+    """
+    raw_df    = pd.json_normalize(
+        [f if isinstance(f, dict) else {} for f in signals_df['features_parsed']]
+    )
+    direction = raw_df.get('candidate_direction', pd.Series('BUY', index=raw_df.index))
+    is_sell   = (direction == 'SELL').to_numpy(dtype=bool)
+    # SELL candidate labels are stored as +1-when-TP1-hit (price DOWN),
+    # so they are inverted to match the model's directional output.
+    raw_label = signals_df['label'].to_numpy(dtype=np.int64)
+    return {
+        'feat_df':   _feature_frame(raw_df),
+        'is_sell':   is_sell,
+        'adj_label': np.where(is_sell, -raw_label, raw_label),
+        # Filled in by _share_weights when two models are compared
+        'shared_names': frozenset(),
+        'shared_logit': 0.0,
+    }
+
+
+def _share_weights(a: dict, b: dict, ev: dict) -> None:
     """
-    Return label in the model's coordinate system (price-UP = +1).
-    SELL candidate labels are stored as +1-when-TP1-hit (price DOWN),
-    so they must be inverted to match the model's directional output.
+    Score the features that models a and b weight identically once, into
+    ev['shared_logit'].  A retrained challenger usually keeps many of the
+    champion's weights, so each _evaluate then only multiplies the rest.
     """
-    if feats.get('candidate_direction') == 'SELL':
-        return -label
-    return label
+    same = [n for n in a['_names'] if b['weights'].get(n) == a['weights'][n]]
+    if not same:
+        return
+    w = np.fromiter((a['weights'][n] for n in same), dtype=np.float64, count=len(same))
+    X = ev['feat_df'].reindex(columns=same, fill_value=0.0).to_numpy(dtype=np.float64)
+    ev['shared_names'] = frozenset(same)
+    ev['shared_logit'] = X @ w
 
 
-def _evaluate(model: dict, signals_df: pd.DataFrame) -> dict:
+def _evaluate(model: dict, ev: dict) -> dict:
     """
-    Score signals_df against model and return evaluation metrics.
+    Score the prepared eval set (see _prepare_eval) against model and return
+    evaluation metrics.
 
     The model predicts P(price UP).  We evaluate:
       - BUY signals  : predicted when p >= BUY_THRESHOLD  → win when adj_label == +1
@@ -115,45 +168,24 @@ def _evaluate(model: dict, signals_df: pd.DataFrame) -> dict:
       max_consec_loss — max consecutive wrong calls among predicted signals
       pnl_proxy       — mean adj_label among predicted signals (+1/-1 scale)
     """
-    rows = []
-    for _, row in signals_df.iterrows():
-        feats = row['features_parsed']
-        p     = _score_model(model, feats)  # type: ignore[arg-type]
-        raw_label = int(row['label'])  # type: ignore[arg-type]
-        adj_label = _direction_adjusted_label(
-            raw_label, feats if isinstance(feats, dict) else {}  # type: ignore[arg-type]
-        )
-        direction = (feats if isinstance(feats, dict) else {}).get(  # type: ignore[arg-type]
-            'candidate_direction', 'BUY'
-        )
-        rows.append({'p': p, 'adj_label': adj_label, 'direction': direction})
-
-    df = pd.DataFrame(rows)
+    p         = _score_matrix(model, ev)
+    is_sell   = ev['is_sell']
+    adj_label = ev['adj_label']
 
     # Model predicts price UP.  Trade when confident in BUY or confident in SELL.
-    buy_signals  = df[(df['direction'] != 'SELL') & (df['p'] >= BUY_THRESHOLD)]
-    sell_signals = df[(df['direction'] == 'SELL')  & (df['p'] <= SELL_THRESHOLD)]
-    predicted    = pd.concat([buy_signals, sell_signals])
-    n_predicted  = len(predicted)
+    # One mask over both directions keeps the calls in signal (time) order.
+    traded      = np.where(is_sell, p <= SELL_THRESHOLD, p >= BUY_THRESHOLD)
+    predicted   = adj_label[traded]
+    n_predicted = len(predicted)
 
     if n_predicted == 0:
         return {'hit_rate': 0.0, 'n_predicted': 0, 'max_consec_loss': 0, 'pnl_proxy': 0.0}
 
     # hit = adj_label == +1 for BUY, adj_label == -1 (i.e. -adj_label==+1) for SELL
     # Since adj_label is already inverted for SELL, win = adj_label > 0 for both
-    hit_rate = float((predicted['adj_label'] == 1).mean())
-
-    # Max consecutive losses
-    labels_seq = predicted['adj_label'].tolist()
-    max_cl = cur_cl = 0
-    for lbl in labels_seq:
-        if lbl != 1:
-            cur_cl += 1
-            max_cl = max(max_cl, cur_cl)
-        else:
-            cur_cl = 0
-
-    pnl_proxy = float(predicted['adj_label'].mean())  # type: ignore[arg-type]
+    hit_rate  = float((predicted == 1).mean())
+    max_cl    = _max_run(predicted != 1)
+    pnl_proxy = float(predicted.mean())
 
     return {
         'hit_rate':        hit_rate,
@@ -202,12 +234,16 @@ def main():  # pylint: disable=too-many-locals
     print(f'Evaluating on {len(signals_df)} recent labelled signals '
           f'(last {EVAL_DAYS} days)...')
 
-    # Parse features
-    signals_df['features_parsed'] = signals_df['features'].apply(
-        lambda x: x if isinstance(x, dict) else json.loads(x)
-    )
+    # Parse features (JSONB arrives as dict; TEXT/bytes are decoded in bulk)
+    signals_df['features_parsed'] = [
+        x if isinstance(x, dict) else orjson.loads(x)
+        for x in signals_df['features'].to_numpy()
+    ]
+    ev = _prepare_eval(signals_df)
+    if champion is not None:
+        _share_weights(challenger, champion, ev)
 
-    chal_metrics = _evaluate(challenger, signals_df)
+    chal_metrics = _evaluate(challenger, ev)
     print(f'  Challenger — hit_rate={chal_metrics["hit_rate"]:.3f} '
           f'n_predicted={chal_metrics["n_predicted"]} '
           f'max_consec_loss={chal_metrics["max_consec_loss"]} '
@@ -219,7 +255,7 @@ def main():  # pylint: disable=too-many-locals
         promote = True
         champ_metrics = {'hit_rate': 0.0, 'n_predicted': 0, 'max_consec_loss': 0}
     else:
-        champ_metrics = _evaluate(champion, signals_df)
+        champ_metrics = _evaluate(champion, ev)
         print(f'  Champion   — hit_rate={champ_metrics["hit_rate"]:.3f} '
               f'n_predicted={champ_metrics["n_predicted"]} '
               f'max_consec_loss={champ_metrics["max_consec_loss"]} '
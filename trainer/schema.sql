@@ -35,6 +35,108 @@ CREATE TABLE IF NOT EXISTS signals (
   created_at    TIMESTAMPTZ  DEFAULT NOW()
 );
 CREATE INDEX IF NOT EXISTS signals_epic_ts ON signals (epic, ts DESC);
+-- Recent-SCALP reads (promote.py eval window, label_signals.py backlog).
+CREATE INDEX IF NOT EXISTS signals_scalp_ts ON signals (ts) WHERE mode = 'SCALP';
+
+-- ── Flattened signal features (read by train.py) ─────────────
+-- The train.py FEATURE_NAMES keys of signals.features as plain REAL
+-- columns, filled by a trigger as signals are inserted.  Training reads
+-- these instead of re-parsing 30 days of JSONB every run.
+-- Adding a feature to FEATURE_NAMES means adding its column here too.
+CREATE TABLE IF NOT EXISTS signals_features_flat (
+  signal_id            BIGINT PRIMARY KEY REFERENCES signals(id) ON DELETE CASCADE,
+  ts                   BIGINT NOT NULL,
+  mode                 TEXT   NOT NULL,
+  candidate_direction  TEXT,
+  spread               REAL   NOT NULL,
+  spread_norm          REAL   NOT NULL,
+  m15_ema200_dist_atr  REAL   NOT NULL,
+  m5_ema20_50_dist_atr REAL   NOT NULL,
+  m5_atr               REAL   NOT NULL,
+  m5_close_ema50_dist  REAL   NOT NULL,
+  m5_rsi14             REAL   NOT NULL,
+  m5_bb_width          REAL   NOT NULL,
+  m5_atr_ratio         REAL   NOT NULL,
+  m15_trend_strength   REAL   NOT NULL,
+  m15_ema200_slope     REAL   NOT NULL,
+  h1_ema200_dist_atr   REAL   NOT NULL,
+  h1_rsi14             REAL   NOT NULL,
+  m1_ema20_50_dist     REAL   NOT NULL,
+  chop                 REAL   NOT NULL,
+  setup_active         REAL   NOT NULL
+);
+CREATE INDEX IF NOT EXISTS signals_features_flat_mode_ts ON signals_features_flat (mode, ts);
+
+-- Numeric feature value; anything that is not a JSON number, or that a
+-- REAL cannot hold (beyond ±3.4e38, or below its normal range), reads as 0.
+-- Read as NUMERIC first so the range check itself can never overflow.
+CREATE OR REPLACE FUNCTION signal_feature(f JSONB, k TEXT) RETURNS REAL
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE WHEN abs(v) BETWEEN 1.2e-38 AND 3.4e38 THEN CAST(v AS REAL) ELSE 0 END
+  FROM (SELECT CASE WHEN jsonb_typeof(f -> k) = 'number'
+                    THEN CAST(f ->> k AS NUMERIC) END AS v) AS x
+$$;
+
+-- Runs on the bot's insert path, so it must never fail a signals INSERT:
+-- any error here is logged as a warning and the flat row is skipped.
+
+CREATE OR REPLACE FUNCTION signals_features_flat_insert() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO signals_features_flat
+  VALUES (NEW.id, NEW.ts, NEW.mode, NEW.features ->> 'candidate_direction',
+          signal_feature(NEW.features, 'spread'),
+          signal_feature(NEW.features, 'spread_norm'),
+          signal_feature(NEW.features, 'm15_ema200_dist_atr'),
+          signal_feature(NEW.features, 'm5_ema20_50_dist_atr'),
+          signal_feature(NEW.features, 'm5_atr'),
+          signal_feature(NEW.features, 'm5_close_ema50_dist'),
+          signal_feature(NEW.features, 'm5_rsi14'),
+          signal_feature(NEW.features, 'm5_bb_width'),
+          signal_feature(NEW.features, 'm5_atr_ratio'),
+          signal_feature(NEW.features, 'm15_trend_strength'),
+          signal_feature(NEW.features, 'm15_ema200_slope'),
+          signal_feature(NEW.features, 'h1_ema200_dist_atr'),
+          signal_feature(NEW.features, 'h1_rsi14'),
+          signal_feature(NEW.features, 'm1_ema20_50_dist'),
+          signal_feature(NEW.features, 'chop'),
+          signal_feature(NEW.features, 'setup_active'))
+  ON CONFLICT (signal_id) DO NOTHING;
+  RETURN NULL;
+EXCEPTION WHEN others THEN
+  RAISE WARNING 'signals_features_flat: skipped signal %: %', NEW.id, SQLERRM;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS signals_features_flat_ins ON signals;
+CREATE TRIGGER signals_features_flat_ins
+  AFTER INSERT ON signals
+  FOR EACH ROW EXECUTE FUNCTION signals_features_flat_insert();
+
+-- Backfill signals written before the trigger existed.  Only rows missing
+-- from the flat table are converted, so re-applying this file is cheap.
+INSERT INTO signals_features_flat
+SELECT s.id, s.ts, s.mode, s.features ->> 'candidate_direction',
+       signal_feature(s.features, 'spread'),
+       signal_feature(s.features, 'spread_norm'),
+       signal_feature(s.features, 'm15_ema200_dist_atr'),
+       signal_feature(s.features, 'm5_ema20_50_dist_atr'),
+       signal_feature(s.features, 'm5_atr'),
+       signal_feature(s.features, 'm5_close_ema50_dist'),
+       signal_feature(s.features, 'm5_rsi14'),
+       signal_feature(s.features, 'm5_bb_width'),
+       signal_feature(s.features, 'm5_atr_ratio'),
+       signal_feature(s.features, 'm15_trend_strength'),
+       signal_feature(s.features, 'm15_ema200_slope'),
+       signal_feature(s.features, 'h1_ema200_dist_atr'),
+       signal_feature(s.features, 'h1_rsi14'),
+       signal_feature(s.features, 'm1_ema20_50_dist'),
+       signal_feature(s.features, 'chop'),
+       signal_feature(s.features, 'setup_active')
+FROM signals s
+WHERE NOT EXISTS (SELECT 1 FROM signals_features_flat x WHERE x.signal_id = s.id)
+ON CONFLICT (signal_id) DO NOTHING;
 
 -- ── Trades (algorithm sections K/L: order placement + management) ─
 CREATE TABLE IF NOT EXISTS trades (
@@ -65,6 +167,10 @@ CREATE TABLE IF NOT EXISTS labels (
   ret_norm      DOUBLE PRECISION,           -- future_return / ATR14_M5[t]
   computed_at   TIMESTAMPTZ      DEFAULT NOW()
 );
+-- Only non-neutral labels are ever trained or evaluated on; train.py's
+-- "new labels since last run" count is an index-only scan of this.
+CREATE INDEX IF NOT EXISTS labels_nonzero_computed
+  ON labels (computed_at, signal_id) WHERE label != 0;
 
 -- ── Quotes (live bid/ask ticks, flushed every ~60 s) ──────────
 -- Useful for spread analysis, slippage studies, and offline replay.
@@ -22,7 +22,9 @@ Requires: DB_URL in .env
 import os
 import sys
 import json
+import shutil
 from datetime import datetime, timezone, timedelta
+from typing import cast
 
 import numpy as np
 import pandas as pd
@@ -32,6 +34,7 @@ from sklearn.metrics import roc_auc_score
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
+from sklearn.utils.parallel import Parallel, delayed
 from sqlalchemy import create_engine, text
 
 # ── Config ────────────────────────────────────────────────────
@@ -40,10 +43,14 @@ MIN_SAMPLES          = 50     # minimum labelled rows to train
 NEW_LABELS_THRESHOLD = 20     # skip if fewer new labels since last train
 BUY_THRESHOLD        = 0.60   # p(up) threshold for BUY entries
 SELL_THRESHOLD       = 0.40   # p(up) threshold for SELL entries
-CV_SPLITS            = 5      # walk-forward folds
+CV_SPLITS            = 5      # walk-forward folds (fewer on small windows)
+CV_MIN_FOLD_ROWS     = 30     # rows per fold below which a split is dropped
+CV_MIN_CLASS_FRAC    = 0.05   # skip CV when either class is rarer than this
+READ_CHUNK           = 10_000 # training rows streamed per fetch
 
 # Features used for training.  These keys must match what strategy.js
-# writes into signals.features JSONB.
+# writes into signals.features JSONB, and the columns of
+# signals_features_flat in schema.sql.
 FEATURE_NAMES = [
     # Spread / ATR
     'spread',
@@ -81,33 +88,88 @@ os.makedirs(MODELS_DIR, exist_ok=True)
 
 engine = create_engine(DB_URL)
 
-
-def extract_feature(features_json: dict, name: str) -> float:
-    """Safely extract a numeric feature value, returning 0 for missing."""
-    v = features_json.get(name, 0.0)
-    try:
-        f = float(v)
-        return 0.0 if not np.isfinite(f) else f
-    except (TypeError, ValueError):
-        return 0.0
+# ── SQL (built once at import) ────────────────────────────────
+# Non-neutral labels since the last training run; 9999 when never trained.
+# labels.signal_id references signals, so no join is needed to count.
+COUNT_NEW_LABELS = text("""
+    WITH last_run AS (
+        SELECT MAX(finished_at) AS finished_at FROM training_runs
+    )
+    SELECT CASE
+             WHEN r.finished_at IS NULL THEN 9999   -- never trained → always proceed
+             ELSE (SELECT COUNT(*) FROM labels l
+                   WHERE l.computed_at > r.finished_at AND l.label != 0)
+           END
+    FROM last_run r
+""")
+
+# Features come pre-flattened by the signals trigger (see schema.sql)
+SELECT_TRAINING_SET = text(f"""
+    SELECT f.ts, l.label, f.candidate_direction,
+           {', '.join(f'f.{n}' for n in FEATURE_NAMES)}
+    FROM signals_features_flat f
+    JOIN labels l ON l.signal_id = f.signal_id
+    WHERE f.mode = 'SCALP'
+      AND f.ts >= :cutoff_ts
+      AND l.label != 0
+    ORDER BY f.ts
+""")
+
+UPSERT_MODEL_REGISTRY = text("""
+    INSERT INTO model_registry
+        (model_version, n_train, roc_auc, notes, status)
+    VALUES (:v, :n, :auc, :notes, 'challenger')
+    ON CONFLICT (model_version) DO UPDATE
+      SET roc_auc = EXCLUDED.roc_auc,
+          n_train = EXCLUDED.n_train,
+          status  = 'challenger'
+""")
+
+INSERT_TRAINING_RUN = text("""
+    INSERT INTO training_runs
+        (model_version, started_at, finished_at,
+         n_train, n_val,
+         train_start_ts, train_end_ts,
+         cv_roc_auc, val_hit_rate,
+         promoted, notes)
+    VALUES
+        (:v, :start, :finish,
+         :n_train, :n_val,
+         :ts_start, :ts_end,
+         :auc, :hit_rate,
+         FALSE, :notes)
+""")
 
 
 def _new_labels_since_last_train(conn) -> int:
-    """Count non-neutral labels created after the last training run."""
-    row = conn.execute(text("""
-        SELECT MAX(finished_at) FROM training_runs WHERE finished_at IS NOT NULL
-    """)).fetchone()
-    last_train = row[0]
-
-    if last_train is None:
-        return 9999  # never trained → always proceed
-
-    count = conn.execute(text("""
-        SELECT COUNT(*) FROM labels l
-        JOIN signals s ON s.id = l.signal_id
-        WHERE l.computed_at > :since AND l.label != 0
-    """), {'since': last_train}).fetchone()[0]
-    return int(count)
+    """
+    Count non-neutral labels created after the last training run, in one
+    round-trip.  Returns 9999 when there has never been a run.
+    """
+    return int(conn.execute(COUNT_NEW_LABELS).scalar_one())
+
+
+def _fit_fold(x: np.ndarray, y: np.ndarray, n_train: int,
+              mean: np.ndarray, std: np.ndarray) -> tuple:
+    """
+    Fit one walk-forward fold: the first n_train rows train, the rest validate.
+    Returns (roc_auc, hit_rate, fitted model); hit_rate is None when nothing
+    clears BUY_THRESHOLD.
+    """
+    x_scaled = np.empty_like(x)
+    np.subtract(x, mean, out=x_scaled, casting='same_kind')
+    np.divide(x_scaled, std, out=x_scaled, casting='same_kind')
+
+    lr = LogisticRegression(C=1.0, max_iter=500, class_weight='balanced')
+    lr.fit(x_scaled[:n_train], y[:n_train])
+    prob  = lr.predict_proba(x_scaled[n_train:])[:, 1]
+    y_val = y[n_train:]
+
+    # Hits among predicted positives: one count and one dot, no gathered subarray
+    pred_positive = prob >= BUY_THRESHOLD
+    n_pos    = int(np.count_nonzero(pred_positive))
+    hit_rate = int(np.dot(y_val, pred_positive)) / n_pos if n_pos else None
+    return float(roc_auc_score(y_val, prob)), hit_rate, lr
 
 
 def main():  # pylint: disable=too-many-locals
@@ -124,15 +186,14 @@ def main():  # pylint: disable=too-many-locals
                   f'(need {NEW_LABELS_THRESHOLD}). Skipping.')
             sys.exit(0)
 
-        df = pd.read_sql(text("""
-            SELECT s.ts, s.features, l.label
-            FROM signals s
-            JOIN labels l ON l.signal_id = s.id
-            WHERE s.mode = 'SCALP'
-              AND s.ts >= :cutoff_ts
-              AND l.label != 0
-            ORDER BY s.ts
-        """), conn, params={'cutoff_ts': cutoff_ts})
+        # Streamed from a server-side cursor READ_CHUNK rows at a time, so the
+        # driver never buffers the whole result next to the DataFrame.
+        chunks = pd.read_sql(SELECT_TRAINING_SET,
+                             conn.execution_options(stream_results=True),
+                             params={'cutoff_ts': cutoff_ts},
+                             dtype={n: 'float32' for n in FEATURE_NAMES},
+                             chunksize=READ_CHUNK)
+        df = pd.concat(chunks, ignore_index=True)
 
     if len(df) < MIN_SAMPLES:
         print(f'Only {len(df)} labelled samples — need at least {MIN_SAMPLES}. Skipping.')
@@ -142,74 +203,90 @@ def main():  # pylint: disable=too-many-locals
     train_end_ts   = int(df['ts'].max())  # type: ignore[arg-type]
 
     print(f'Training on {len(df)} samples (window={WINDOW_DAYS}d)...')
-    print(f'  Label distribution: +1={sum(df.label==1)}, -1={sum(df.label==-1)}')
-
-    # Parse JSONB features
-    df['features_parsed'] = df['features'].apply(
-        lambda x: x if isinstance(x, dict) else json.loads(x)
-    )
+    lbl = df['label'].to_numpy(dtype=np.int64)
+    print(f'  Label distribution: +1={int((lbl == 1).sum())}, -1={int((lbl == -1).sum())}')
 
     # Normalize labels to a directional target: y=1 means "price went UP" was the
     # correct outcome.  For BUY candidates label=+1 already means price UP.
     # For SELL candidates label=+1 means price DOWN (profitable SELL), which must
     # be flipped to label=-1 before training so the model always predicts price UP.
-    def _direction_adjusted_label(row) -> int:
-        feats = row['features_parsed']
-        direction = feats.get('candidate_direction') if isinstance(feats, dict) else None
-        lbl = int(row['label'])  # type: ignore[arg-type]
-        if direction == 'SELL':
-            return -lbl   # invert: profitable SELL (price DOWN) → -1
-        return lbl
-
-    df['label_adj'] = df.apply(_direction_adjusted_label, axis=1)
-    n_sell = int((df['features_parsed'].apply(  # type: ignore[arg-type]
-        lambda f: (f if isinstance(f, dict) else {}).get('candidate_direction') == 'SELL'
-    )).sum())
+    is_sell = (df['candidate_direction'] == 'SELL').to_numpy(dtype=bool)
+    lbl_adj = np.where(is_sell, -lbl, lbl)   # invert: profitable SELL (price DOWN) → -1
+
+    n_sell = int(is_sell.sum())
     print(f'  Direction breakdown: SELL candidates={n_sell}, BUY/other={len(df)-n_sell}')
-    print(f'  Adjusted label dist: +1={sum(df.label_adj==1)}, -1={sum(df.label_adj==-1)}')
+    print(f'  Adjusted label dist: +1={int((lbl_adj == 1).sum())}, '
+          f'-1={int((lbl_adj == -1).sum())}')
 
-    x_train = np.array([
-        [extract_feature(row, name) for name in FEATURE_NAMES]
-        for row in df['features_parsed']
-    ])
-    y = np.asarray((df['label_adj'] == 1).astype(int))
+    # float32 throughout: the features are smooth technicals, and half the
+    # bytes halves memory traffic through the scaler and LBFGS.
+    x_train = df[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    y = (lbl_adj == 1).astype(np.int32)
 
     # Walk-forward (time-series) CV — avoids lookahead leakage
-    tscv = TimeSeriesSplit(n_splits=CV_SPLITS)
-    aucs      = []
-    hit_rates = []
-    for train_idx, val_idx in tscv.split(x_train):
-        if len(set(y[val_idx])) < 2:
+    # Small windows get fewer folds so each still has CV_MIN_FOLD_ROWS rows;
+    # with a near-single-class target the fold AUCs are noise, so CV is skipped.
+    n_splits = max(2, min(CV_SPLITS, len(y) // CV_MIN_FOLD_ROWS))
+    pos_frac = float(y.mean())
+    run_cv   = CV_MIN_CLASS_FRAC <= pos_frac <= 1 - CV_MIN_CLASS_FRAC
+    if not run_cv:
+        print(f'  Warning: {pos_frac:.1%} of targets are +1 — skipping CV')
+    tscv = TimeSeriesSplit(n_splits=n_splits)
+    # Training folds are expanding prefixes of the ts-sorted rows, so each
+    # fold's scaler mean/std is read off running sums instead of refitted.
+    # Running sums are kept in float64: E[x²] - E[x]² cancels badly in float32
+    x64       = x_train.astype(np.float64)
+    cum_sum   = np.cumsum(x64, axis=0)
+    cum_sumsq = np.cumsum(x64 * x64, axis=0)
+    del x64
+    folds = []
+    for train_idx, val_idx in (tscv.split(x_train) if run_cv else ()):
+        y_val = y[val_idx]
+        if y_val.min() == y_val.max():  # single-class fold: AUC undefined
             continue
-        fold_pipe = Pipeline([
-            ('scaler', StandardScaler()),
-            ('lr',     LogisticRegression(C=1.0, max_iter=500, class_weight='balanced')),
-        ])
-        fold_pipe.fit(x_train[train_idx], y[train_idx])
-        prob = fold_pipe.predict_proba(x_train[val_idx])[:, 1]
-        aucs.append(float(roc_auc_score(y[val_idx], prob)))
-        pred_positive = prob >= BUY_THRESHOLD
-        if pred_positive.any():
-            hit_rates.append(float(y[val_idx][pred_positive].mean()))
+        n    = train_idx[-1] + 1
+        mean = cum_sum[n - 1] / n
+        var  = np.maximum(cum_sumsq[n - 1] / n - mean * mean, 0.0)
+        # Constant columns are left unscaled, as StandardScaler does
+        std  = np.where(var > 1e-12 * np.maximum(mean * mean, 1.0), np.sqrt(var), 1.0)
+        end  = val_idx[-1] + 1
+        folds.append((x_train[:end], y[:end], n, mean, std))
+
+    # Folds are independent fits; threads share x_train without pickling it
+    # and skip process start-up, which outweighs a fit at this data size.
+    # Materialised and cast: Parallel's result is typed as list | generator | None.
+    results = cast(list[tuple], list(
+        Parallel(n_jobs=max(1, min(len(folds), os.cpu_count() or 1)),
+                 prefer='threads')(delayed(_fit_fold)(*fold) for fold in folds)))
+    aucs      = [auc for auc, _, _ in results]
+    hit_rates = [hit for _, hit, _ in results if hit is not None]
 
     cv_auc      = float(np.mean(aucs))      if aucs      else float('nan')
     cv_hit_rate = float(np.mean(hit_rates)) if hit_rates else float('nan')
     n_val       = len(aucs)
-    print(f'  Walk-forward CV ROC-AUC ({n_val}/{CV_SPLITS} folds): {cv_auc:.4f}')
+    print(f'  Walk-forward CV ROC-AUC ({n_val}/{n_splits} folds): {cv_auc:.4f}')
     print(f'  Walk-forward CV hit-rate: {cv_hit_rate:.4f}')
 
-    # Final fit on all data
+    # Final fit on all data, warm-started from the last (largest) CV fold:
+    # it was fitted on most of these rows, so LBFGS starts near the optimum.
+    final_lr = LogisticRegression(C=1.0, max_iter=500, class_weight='balanced',
+                                  warm_start=True)
+    if results:
+        last_lr = results[-1][2]
+        final_lr.coef_      = last_lr.coef_.copy()
+        final_lr.intercept_ = last_lr.intercept_.copy()
     pipe = Pipeline([
         ('scaler', StandardScaler()),
-        ('lr',     LogisticRegression(C=1.0, max_iter=500, class_weight='balanced')),
+        ('lr',     final_lr),
     ])
     pipe.fit(x_train, y)
     lr = pipe.named_steps['lr']
     sc = pipe.named_steps['scaler']
 
     # Recover original-space weights: w_orig[i] = w_lr[i] / scale[i]
-    w_scaled = lr.coef_[0]
-    scale     = sc.scale_
+    # (in float64, whatever precision the fit ran in)
+    w_scaled = lr.coef_[0].astype(np.float64)
+    scale     = sc.scale_.astype(np.float64)
     w_orig    = w_scaled / scale
     bias      = float(lr.intercept_[0]) - float(np.dot(w_scaled, sc.mean_ / scale))
 
@@ -218,7 +295,11 @@ def main():  # pylint: disable=too-many-locals
         'model_version': version,
         'feature_names': FEATURE_NAMES,
         'bias':          round(float(bias), 6),
-        'weights':       {name: round(float(w), 6) for name, w in zip(FEATURE_NAMES, w_orig)},
+        # Positional, aligned with feature_names, so scoring is a plain dot
+        # product.  weights_map is the older name → weight form, kept while
+        # anything still reads it.
+        'weights':       np.round(w_orig, 6).tolist(),
+        'weights_map':   {name: round(float(w), 6) for name, w in zip(FEATURE_NAMES, w_orig)},
         'meta': {
             'trained_at':      started_at.isoformat(),
             'n_train':         len(df),
@@ -231,51 +312,39 @@ def main():  # pylint: disable=too-many-locals
         },
     }
 
-    # Write challenger — promote.py decides whether to copy to current.json
+    # Write challenger — promote.py decides whether to copy to current.json.
+    # Written to a temp file and renamed into place: the swap is atomic and
+    # every run gets a fresh inode, so the archive can be a hard link to it.
     challenger_path = os.path.join(MODELS_DIR, 'challenger.json')
-    with open(challenger_path, 'w', encoding='utf-8') as f:
+    tmp_path        = challenger_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(model, f, indent=2)
+    os.replace(tmp_path, challenger_path)
     print(f'  Challenger saved → {challenger_path}')
 
     archive_path = os.path.join(MODELS_DIR, f'model_{version}.json')
-    with open(archive_path, 'w', encoding='utf-8') as f:
-        json.dump(model, f, indent=2)
+    if os.path.exists(archive_path):
+        os.remove(archive_path)  # retrained within the same hour
+    try:
+        os.link(challenger_path, archive_path)
+    except OSError:
+        shutil.copyfile(challenger_path, archive_path)  # no hard links here
     print(f'  Archive → {archive_path}')
     print(f'  Version: {version}')
 
     finished_at = datetime.now(timezone.utc)
 
-    # Persist to DB (non-fatal)
+    # Persist to DB (non-fatal).  Both rows go in one transaction: committed
+    # together when the block exits, rolled back together if either fails.
     try:
-        with engine.connect() as conn:
-            conn.execute(text("""
-                INSERT INTO model_registry
-                    (model_version, n_train, roc_auc, notes, status)
-                VALUES (:v, :n, :auc, :notes, 'challenger')
-                ON CONFLICT (model_version) DO UPDATE
-                  SET roc_auc = EXCLUDED.roc_auc,
-                      n_train = EXCLUDED.n_train,
-                      status  = 'challenger'
-            """), {
+        with engine.begin() as conn:
+            conn.execute(UPSERT_MODEL_REGISTRY, {
                 'v':     version,
                 'n':     len(df),
                 'auc':   round(float(cv_auc), 4),
                 'notes': f'window={WINDOW_DAYS}d C=1.0 walk-forward-cv',
             })
-            conn.execute(text("""
-                INSERT INTO training_runs
-                    (model_version, started_at, finished_at,
-                     n_train, n_val,
-                     train_start_ts, train_end_ts,
-                     cv_roc_auc, val_hit_rate,
-                     promoted, notes)
-                VALUES
-                    (:v, :start, :finish,
-                     :n_train, :n_val,
-                     :ts_start, :ts_end,
-                     :auc, :hit_rate,
-                     FALSE, :notes)
-            """), {
+            conn.execute(INSERT_TRAINING_RUN, {
                 'v':        version,
                 'start':    started_at,
                 'finish':   finished_at,
@@ -287,8 +356,7 @@ def main():  # pylint: disable=too-many-locals
                 'hit_rate': round(float(cv_hit_rate), 4),
                 'notes':    f'window={WINDOW_DAYS}d C=1.0 walk-forward-cv',
             })
-            conn.commit()
-            print('  Registered as challenger in DB (model_registry + training_runs).')
+        print('  Registered as challenger in DB (model_registry + training_runs).')
     except Exception as e:  # pylint: disable=broad-exception-caught
         print(f'  Warning: could not register in DB: {e}')
 